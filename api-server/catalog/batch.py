@@ -0,0 +1,112 @@
+"""
+Batch cart mutations: apply many add/update/remove operations at once.
+
+All operations are resolved in memory against the cart's current lines and
+a single stock lookup, then written with one `bulk_create`, one
+`bulk_update` and one delete, together with one adjustment of the cart's
+stored totals. Reads and writes share one transaction, which takes SQLite's
+write lock at BEGIN (`transaction_mode`), so concurrent batches on a cart
+apply one after the other, each against the lines the previous one left.
+Either every operation applies or none does.
+"""
+from django.db import transaction
+
+from .models import Cart, CartItem, Product
+
+ITEM_NOT_FOUND = 'Item not found in cart.'
+PRODUCT_NOT_FOUND = 'Product not found.'
+EXCEEDS_STOCK = 'Requested quantity exceeds stock.'
+
+
+class BatchError(Exception):
+    """Raised with one error dict per operation (empty when it was fine)."""
+
+    def __init__(self, errors):
+        super().__init__('Invalid cart operations.')
+        self.errors = errors
+
+
+def apply_cart_operations(cart, operations):
+    """Apply validated `CartOperationSerializer` data to `cart`."""
+    with transaction.atomic():
+        _apply(cart, operations)
+
+
+def _apply(cart, operations):
+    lines = {
+        item.product_id: item for item in cart.items.select_for_update()
+    }
+    lines_by_id = {item.pk: item for item in lines.values()}
+
+    product_ids = {
+        op['product_id'] for op in operations if op['op'] == 'add'
+    }
+    product_ids.update(
+        lines_by_id[op['item_id']].product_id for op in operations
+        if op['op'] != 'add' and op['item_id'] in lines_by_id
+    )
+    stock, prices = {}, {}
+    for pk, quantity, price in (
+        Product.objects.filter(pk__in=product_ids)
+        .values_list('pk', 'quantity', 'price')
+    ):
+        stock[pk] = quantity
+        prices[pk] = price
+
+    quantities = {}
+    last_op = {}
+    errors = [{} for _ in operations]
+    for index, op in enumerate(operations):
+        if op['op'] == 'add':
+            product_id = op['product_id']
+            if product_id not in stock:
+                errors[index] = {'product_id': [PRODUCT_NOT_FOUND]}
+                continue
+            current = quantities.get(product_id)
+            if current is None:
+                line = lines.get(product_id)
+                current = line.quantity if line else 0
+            quantities[product_id] = current + op['quantity']
+        else:
+            line = lines_by_id.get(op['item_id'])
+            if line is None or quantities.get(line.product_id) == 0:
+                errors[index] = {'item_id': [ITEM_NOT_FOUND]}
+                continue
+            product_id = line.product_id
+            quantities[product_id] = (
+                op['quantity'] if op['op'] == 'update' else 0
+            )
+        last_op[product_id] = index
+
+    for product_id, quantity in quantities.items():
+        if quantity > stock[product_id]:
+            errors[last_op[product_id]] = {'quantity': [EXCEEDS_STOCK]}
+    if any(errors):
+        raise BatchError(errors)
+
+    to_create, to_update, to_delete = [], [], []
+    subtotal, item_count = 0, 0
+    for product_id, quantity in quantities.items():
+        line = lines.get(product_id)
+        delta = quantity - (line.quantity if line else 0)
+        subtotal += delta * prices[product_id]
+        item_count += delta
+        if line is None:
+            if quantity:
+                to_create.append(CartItem(
+                    cart=cart, product_id=product_id, quantity=quantity,
+                ))
+        elif not quantity:
+            to_delete.append(line.pk)
+        elif quantity != line.quantity:
+            line.quantity = quantity
+            to_update.append(line)
+
+    if to_create:
+        CartItem.objects.bulk_create(to_create)
+    if to_update:
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+    if to_delete:
+        CartItem.objects.filter(pk__in=to_delete).delete()
+    if item_count or subtotal:
+        Cart.objects.filter(pk=cart.pk).adjust_totals(subtotal, item_count)
@@ -0,0 +1,111 @@
+"""
+Versioned cache of serialized representations.
+
+Entries are keyed by `(serializer class, pk, updated_at, related
+updated_at...)`, so saving a product or its category produces a new key and
+stale entries are simply never read again; the LRU bound of the backing
+cache (see `CATALOG_SERIALIZER_CACHE` in settings) evicts them.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from showcase_api.timing import TimedListSerializer
+
+from .representations import values_representation
+
+
+def serializer_cache():
+    """Return the configured cache, or None when caching is disabled."""
+    alias = getattr(settings, 'CATALOG_SERIALIZER_CACHE', None)
+    if not alias or alias not in settings.CACHES:
+        return None
+    return caches[alias]
+
+
+def row_value(row, lookup):
+    """Read `lookup` from a model instance or a `values()` row."""
+    if isinstance(row, dict):
+        return row['id' if lookup == 'pk' else lookup]
+    value = row
+    for attr in lookup.split('__'):
+        value = getattr(value, attr)
+    return value
+
+
+class CachedRepresentationMixin:
+    """
+    Serializer mixin caching `to_representation()` output.
+
+    `cache_version_fields` lists the timestamp lookups that change whenever
+    the output does.
+    """
+    cache_version_fields = ('updated_at',)
+
+    def cache_key(self, row):
+        parts = [
+            type(self).__module__, type(self).__qualname__,
+            row_value(row, 'pk'),
+        ]
+        for lookup in self.cache_version_fields:
+            value = row_value(row, lookup)
+            parts.append(value.isoformat() if value else '')
+        return ':'.join(map(str, parts))
+
+    def build_representation(self, instance):
+        return super().to_representation(instance)
+
+    def to_representation(self, instance):
+        cache = serializer_cache()
+        if cache is None:
+            return self.build_representation(instance)
+        key = self.cache_key(instance)
+        data = cache.get(key)
+        if data is None:
+            data = self.build_representation(instance)
+            cache.set(key, data, None)
+        return data
+
+
+class CachedListSerializer(TimedListSerializer):
+    """
+    Fetch a page of representations with one `get_many`.
+
+    Rows may be model instances or `values()` rows carrying just `id` and
+    the cache-version fields. Cache misses that are not fully loaded
+    instances are built from one `values()` query over the missing ids (see
+    `catalog.representations`), without instantiating models.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if hasattr(data, 'all') else data
+        rows = list(iterable)
+        child = self.child
+        cache = serializer_cache()
+        if cache is not None:
+            keys = [child.cache_key(row) for row in rows]
+            cached = cache.get_many(keys)
+        else:
+            keys, cached = [None] * len(rows), {}
+
+        results = [cached.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        pending = []
+        for i in missing:
+            row = rows[i]
+            if isinstance(row, dict) or row.get_deferred_fields():
+                pending.append(i)
+            else:
+                results[i] = child.build_representation(row)
+        if pending:
+            built = values_representation(type(child)).for_pks(
+                child.Meta.model._default_manager,
+                [row_value(rows[i], 'pk') for i in pending],
+            )
+            for i in pending:
+                # None when the row was deleted after the page was read.
+                results[i] = built.get(row_value(rows[i], 'pk'))
+        if cache is not None and missing:
+            cache.set_many({
+                keys[i]: results[i] for i in missing
+                if results[i] is not None
+            }, None)
+        return [result for result in results if result is not None]
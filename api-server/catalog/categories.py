@@ -0,0 +1,125 @@
+"""
+Process-local map of every category.
+
+Product payloads embed `category_name`. Reading it from this map, instead of
+joining or querying the category table for every page, keeps product
+queries on the product table alone. Categories are few and rarely written,
+so each process loads all of them once and reloads only when a category
+has changed since.
+
+Changes are read from the change log (catalog/changes.py): every
+CHECK_INTERVAL the map compares the log's newest category entry with the
+one it was loaded at, in one indexed query, so every process follows
+category writes made by any other within that interval. Model signals and
+the bulk paths record those writes; code that writes categories without
+signals (raw SQL, `QuerySet.update()`) must call `changes.record()` itself,
+and `bump_version()` to have this process reload at once.
+
+The map's version is the newest category's `updated_at`. It feeds the
+serializer cache keys and ETags of product payloads, so renames invalidate
+those too.
+"""
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+
+from .models import CatalogChange, Category
+
+# Version of an empty category table.
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# Seconds between checks of the change log. Reading it costs a query, too
+# much to pay per serialized product; changes made in this process
+# invalidate the map at once regardless.
+CHECK_INTERVAL = 1.0
+
+
+def bump_version():
+    """Have this process check for changes on its next lookup; others check
+    within CHECK_INTERVAL."""
+    category_map.invalidate()
+
+
+def log_position():
+    """The change log's newest category entry (0 when there is none)."""
+    # Always the primary: the map outlives the request, so a lagging
+    # replica's rows would stick until the next category write.
+    changes = CatalogChange.objects.using(DEFAULT_DB_ALIAS)
+    return changes.filter(kind='category').aggregate(
+        seq=Max('seq')
+    )['seq'] or 0
+
+
+class CategorySnapshot:
+    def __init__(self, position, categories):
+        self.position = position
+        self.by_id = {category.pk: category for category in categories}
+        self.version = max(
+            (category.updated_at for category in self.by_id.values()),
+            default=EPOCH,
+        )
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def categories(self):
+        """Every category, in primary key order."""
+        return list(self.by_id.values())
+
+
+class CategoryMap:
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._checked_at = None
+
+    def current(self, reload=False):
+        snapshot = self._snapshot
+        checked_at = self._checked_at
+        now = time.monotonic()
+        if (
+            not reload and snapshot is not None and checked_at is not None
+            and now - checked_at < CHECK_INTERVAL
+        ):
+            return snapshot
+        # Read the position first: changes up to it are in the rows loaded
+        # below, later ones are picked up by the next check.
+        position = log_position()
+        self._checked_at = now
+        if (
+            not reload and snapshot is not None
+            and snapshot.position == position
+        ):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if reload or snapshot is None or snapshot.position != position:
+                queryset = Category.objects.using(DEFAULT_DB_ALIAS)
+                snapshot = CategorySnapshot(position, queryset.order_by('pk'))
+                self._snapshot = snapshot
+        return snapshot
+
+    def version(self):
+        return self.current().version
+
+    def get(self, category_id):
+        """The category with `category_id`, or None if there is none."""
+        category = self.current().by_id.get(category_id)
+        if category is None and category_id is not None:
+            # Possibly created by another process since the last load.
+            category = self.current(reload=True).by_id.get(category_id)
+        return category
+
+    def name(self, category_id):
+        category = self.get(category_id)
+        return category.name if category is not None else None
+
+
+category_map = CategoryMap()
@@ -0,0 +1,95 @@
+"""
+Change log behind the delta-sync feed (`/api/products/changes/`).
+
+Every product and category write upserts the object's `CatalogChange` row
+with the next `seq` of one catalog-wide sequence, flagging deletes as
+tombstones. A client that has seen the log up to cursor N asks for the rows
+with `seq > N`. Each object keeps only its latest row, so the log holds one
+row per object ever written yet still has every change any cursor is
+behind on.
+
+The sequence is `MAX(seq) + n`, taken inside the statement that writes the
+rows. SQLite runs one writer at a time, so sequence numbers commit in order
+and a reader never sees N + 1 before N.
+
+Model signals (catalog/signals.py) record saves and deletes. Code that writes
+products or categories without signals (imports, checkout, seeding) must call
+`record()` or `record_queryset()` itself, in the same transaction.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Max
+
+from .models import CatalogChange
+
+
+def record(model, pks, deleted=False):
+    """Log the `model` objects with primary keys `pks` as changed, or as
+    deleted."""
+    pks = sorted(set(pks))
+    connection = connections[router.db_for_write(CatalogChange)]
+    # One parameter per key, plus the kind and the deleted flag.
+    size = (connection.features.max_query_params or len(pks) + 2) - 2
+    for start in range(0, len(pks), size):
+        chunk = pks[start:start + size]
+        values = ', '.join(['(%s)'] * len(chunk))
+        _upsert(connection, model, f'VALUES {values}', chunk, deleted)
+
+
+def record_queryset(queryset, deleted=False):
+    """Log every object in `queryset` as changed, or as deleted, in one
+    statement."""
+    connection = connections[router.db_for_write(CatalogChange)]
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    _upsert(connection, queryset.model, sql, params, deleted)
+
+
+def _upsert(connection, model, ids_sql, params, deleted):
+    opts = CatalogChange._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    kind, object_id, deleted_column, seq = (
+        quote(opts.get_field(name).column)
+        for name in ('kind', 'object_id', 'deleted', 'seq')
+    )
+    # `WHERE true` tells SQLite's parser the ON CONFLICT clause belongs to
+    # the INSERT, not to a join in the SELECT.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH ids(pk) AS ({ids_sql}), '
+            f'last(seq) AS (SELECT COALESCE(MAX({seq}), 0) FROM {table}) '
+            f'INSERT INTO {table} ({kind}, {object_id}, {deleted_column}, '
+            f'{seq}) '
+            f'SELECT %s, ids.pk, %s, '
+            f'last.seq + ROW_NUMBER() OVER (ORDER BY ids.pk) '
+            f'FROM ids, last WHERE true '
+            f'ON CONFLICT ({kind}, {object_id}) DO UPDATE SET '
+            f'{seq} = excluded.{seq}, '
+            f'{deleted_column} = excluded.{deleted_column}',
+            [*params, model._meta.model_name, deleted],
+        )
+
+
+def position():
+    """The newest `seq` in the log (0 when it is empty). It moves with every
+    recorded write, so it versions anything derived from the catalog."""
+    changes = CatalogChange.objects.using(DEFAULT_DB_ALIAS)
+    return changes.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def since(cursor, limit):
+    """
+    The log after `cursor`, oldest first and at most `limit` entries:
+    `(next_cursor, has_more, changed, deleted)`, where `changed` and
+    `deleted` map each kind to its object ids.
+    """
+    rows = list(
+        CatalogChange.objects.filter(seq__gt=cursor).order_by('seq')
+        .values_list('seq', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changed, deleted = {}, {}
+    for seq, kind, pk, is_deleted in rows:
+        (deleted if is_deleted else changed).setdefault(kind, []).append(pk)
+    next_cursor = rows[-1][0] if rows else cursor
+    return next_cursor, has_more, changed, deleted
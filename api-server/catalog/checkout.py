@@ -0,0 +1,126 @@
+"""
+Cart checkout: reserve stock for every cart line in one transaction.
+
+Stock is decremented with conditional updates
+(`UPDATE ... SET quantity = quantity - n WHERE id = %s AND quantity >= n`)
+rather than read-check-write in Python, so concurrent buyers can never
+oversell and no row is locked ahead of its own update. If any line cannot
+be reserved the whole transaction rolls back.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changes
+from .models import Product
+
+
+class EmptyCart(Exception):
+    pass
+
+
+class OutOfStock(Exception):
+    """Raised with one entry per cart line that could not be reserved."""
+
+    def __init__(self, failures):
+        super().__init__('Insufficient stock for one or more items.')
+        self.failures = failures
+
+
+def is_lock_timeout(exc):
+    """Whether the `OperationalError` `exc` means SQLite gave up waiting for
+    a lock (SQLITE_BUSY or SQLITE_LOCKED), rather than a broken schema,
+    disk or connection."""
+    cause = exc.__cause__ or exc
+    code = getattr(cause, 'sqlite_errorcode', None)
+    if code is not None:
+        # Extended result codes keep the primary code in the low byte.
+        return code & 0xff in (5, 6)
+    return str(exc).startswith(
+        ('database is locked', 'database table is locked')
+    )
+
+
+class _Rollback(Exception):
+    def __init__(self, failed):
+        self.failed = failed
+
+
+def checkout_cart(cart):
+    """
+    Reserve stock for every line of `cart`, empty it and return a receipt
+    with the prices charged. Raises `EmptyCart` or `OutOfStock`.
+    """
+    try:
+        with transaction.atomic():
+            receipt = _reserve(cart)
+    except _Rollback as rollback:
+        raise OutOfStock(_describe_failures(rollback.failed))
+    return receipt
+
+
+def _reserve(cart):
+    # Lines are reserved in product order so concurrent checkouts touching
+    # the same products always take their row locks in the same order.
+    lines = list(
+        cart.items.order_by('product_id').values_list(
+            'pk', 'product_id', 'quantity', 'product__price'
+        )
+    )
+    if not lines:
+        raise EmptyCart()
+
+    now = timezone.now()
+    failed = []
+    for item_id, product_id, quantity, _ in lines:
+        reserved = Product.objects.filter(
+            pk=product_id, quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity, updated_at=now)
+        if not reserved:
+            failed.append((item_id, product_id, quantity))
+    if failed:
+        raise _Rollback(failed)
+    # Stock is part of the product payloads the changes feed serves.
+    changes.record(Product, [product_id for _, product_id, _, _ in lines])
+
+    cart.items.all().delete()
+    cart.subtotal, cart.item_count = Decimal('0.00'), 0
+    cart.save(update_fields=['subtotal', 'item_count', 'updated_at'])
+
+    receipt_lines = []
+    total = Decimal('0.00')
+    for item_id, product_id, quantity, price in lines:
+        line_total = price * quantity
+        total += line_total
+        receipt_lines.append({
+            'item_id': item_id,
+            'product_id': product_id,
+            'quantity': quantity,
+            'unit_price': str(price),
+            'line_total': str(line_total),
+        })
+    return {
+        'cart': cart.pk,
+        'lines': receipt_lines,
+        'total': f'{total:.2f}',
+    }
+
+
+def _describe_failures(failed):
+    """Report each failed line with the stock available after rollback."""
+    available = dict(
+        Product.objects.filter(
+            pk__in=[product_id for _, product_id, _ in failed]
+        ).values_list('pk', 'quantity')
+    )
+    return [
+        {
+            'item_id': item_id,
+            'product_id': product_id,
+            'requested': quantity,
+            'available': available.get(product_id, 0),
+        }
+        for item_id, product_id, quantity in failed
+    ]
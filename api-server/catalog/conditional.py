@@ -0,0 +1,117 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304) for catalog viewsets.
+
+Validators are derived without serializing anything: detail responses use
+the row's `updated_at` (and those of the related rows it embeds), list
+responses use a single `MAX(updated_at)` / `COUNT(*)` aggregate over the
+filtered queryset. A request whose `If-None-Match` / `If-Modified-Since`
+still matches gets a bodiless 304.
+
+Lists carry an ETag only. Deleting a row can leave (or lower) the newest
+`updated_at`, so a Last-Modified date would answer `If-Modified-Since` with
+a 304 for a list that lost rows; the ETag also covers the count.
+"""
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin providing validators for GET responses. `validator_fields`
+    lists the timestamp lookups (`updated_at` plus any embedded relation's)
+    whose latest value changes whenever the payload does.
+    """
+    validator_fields = ['updated_at']
+
+    def list_fingerprint(self, queryset):
+        """Fingerprint a (filtered) queryset in one aggregate query: its row
+        count and the latest value of each validator field."""
+        aggregates = {
+            f'max_{i}': Max(field)
+            for i, field in enumerate(self.validator_fields)
+        }
+        row = queryset.order_by().aggregate(count=Count('pk'), **aggregates)
+        stamps = [row[f'max_{i}'] for i in range(len(self.validator_fields))]
+        return [row['count'], *stamps]
+
+    def list_validators(self, queryset):
+        return self.collection_validators(*self.list_fingerprint(queryset))
+
+    def collection_validators(self, *parts):
+        """`make_validators()` without a Last-Modified date, for responses
+        listing rows (see the module docstring)."""
+        etag, _ = self.make_validators(*parts)
+        return etag, None
+
+    def instance_validators(self, instance):
+        stamps = []
+        for field in self.validator_fields:
+            value = instance
+            for part in field.split('__'):
+                value = getattr(value, part)
+            stamps.append(value)
+        return self.make_validators(instance.pk, *stamps)
+
+    def make_validators(self, *parts):
+        """Build `(etag, last_modified)` for the current request; the URL and
+        renderer are part of the ETag since both shape the payload."""
+        request = self.request
+        stamps = [part for part in parts if hasattr(part, 'utctimetuple')]
+        key = '|'.join(map(str, [
+            request.get_full_path(),
+            getattr(request.accepted_renderer, 'format', ''),
+            *parts,
+        ]))
+        etag = hashlib.md5(key.encode('utf-8')).hexdigest()
+        last_modified = None
+        if stamps:
+            last_modified = timegm(max(stamps).utctimetuple())
+        return etag, last_modified
+
+    def conditional_response(self, validators, respond):
+        """Return a 304 if the client's validators match, otherwise the
+        response built by `respond()`; both carry ETag/Last-Modified."""
+        etag, last_modified = validators
+        response = get_conditional_response(
+            self.request, etag=quote_etag(etag), last_modified=last_modified,
+        )
+        if response is None:
+            response = respond()
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let clients cache, but revalidate on every poll.
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def paginated_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        use_keyset = getattr(self.paginator, 'use_keyset', None)
+        if use_keyset is not None and use_keyset(request):
+            # The fingerprint scans the whole filtered set; keyset pages
+            # exist precisely to avoid that, so they skip validation.
+            return self.paginated_response(queryset)
+        return self.conditional_response(
+            self.list_validators(queryset),
+            lambda: self.paginated_response(queryset),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.conditional_response(
+            self.instance_validators(instance),
+            lambda: Response(self.get_serializer(instance).data),
+        )
@@ -0,0 +1,71 @@
+"""
+Streaming product export as NDJSON or CSV.
+
+Rows are read with `values(...).iterator(chunk_size=...)` and formatted with
+the same `ValuesRepresentation` the list endpoint uses, so every line
+matches the API's product payload. Output is produced one chunk of rows at
+a time; neither the queryset nor the response body is ever held whole in
+memory.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from .representations import values_representation
+
+
+def export_rows(queryset, serializer_class, chunk_size):
+    """Yield representations of every row of `queryset`, streamed from the
+    database `chunk_size` rows at a time."""
+    representation = values_representation(serializer_class)
+    # Relevance ranks (extra selects) must stay selectable for ORDER BY.
+    rows = queryset.values(
+        *representation.lookups, *queryset.query.extra_select
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield representation.build(row)
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def ndjson_chunks(rows, chunk_size):
+    """Encode `rows` as newline-delimited JSON, one bytestring per chunk."""
+    for chunk in _chunks(rows, chunk_size):
+        yield b''.join(_dumps(row) + b'\n' for row in chunk)
+
+
+def csv_chunks(rows, chunk_size):
+    """Encode `rows` as CSV with a header taken from the first row's keys,
+    one bytestring per chunk."""
+    buffer = io.StringIO()
+    writer = None
+    for chunk in _chunks(rows, chunk_size):
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(chunk[0]))
+            writer.writeheader()
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORTERS = {'ndjson': ndjson_chunks, 'csv': csv_chunks}
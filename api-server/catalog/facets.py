@@ -0,0 +1,94 @@
+"""
+Facet counts for the product list: how many of the filtered products fall
+in each category, priority, featured flag and price bucket.
+
+`facet_counts()` runs two queries whatever the catalog size: a GROUP BY on
+category, and one aggregate of conditional counts covering every other
+facet. `cached_facet_counts()` keeps the result in the default cache under
+the filter signature and a version of the catalog: the change log's
+position (catalog/changes.py) and the category map's version. A cache hit
+costs one indexed lookup of that position, never a scan of the products,
+and any recorded write produces a new key rather than a stale hit. Writes
+that skip the log are picked up after CATALOG_FACETS_CACHE_TIMEOUT.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Q
+
+from .categories import category_map
+from .models import Product
+
+
+def price_buckets():
+    """`(low, high)` pairs covering every price; `high` is exclusive and
+    None for the open-ended last bucket."""
+    bounds = [Decimal(str(bound)) for bound in settings.CATALOG_FACET_PRICE_BUCKETS]
+    return list(zip([Decimal('0')] + bounds, bounds + [None]))
+
+
+def money(value):
+    return None if value is None else f'{value:.2f}'
+
+
+def facet_counts(queryset):
+    queryset = queryset.order_by()
+    by_category = queryset.values('category').annotate(count=Count('pk'))
+
+    buckets = price_buckets()
+    aggregates = {
+        'count': Count('pk'),
+        'featured': Count('pk', filter=Q(is_featured=True)),
+    }
+    for value, _ in Product.PRIORITY_CHOICES:
+        aggregates[f'priority_{value}'] = Count('pk', filter=Q(priority=value))
+    for i, (low, high) in enumerate(buckets):
+        in_bucket = Q(price__gte=low)
+        if high is not None:
+            in_bucket &= Q(price__lt=high)
+        aggregates[f'price_{i}'] = Count('pk', filter=in_bucket)
+    row = queryset.aggregate(**aggregates)
+
+    categories = sorted(by_category, key=lambda r: (-r['count'], r['category']))
+    return {
+        'count': row['count'],
+        'category': [
+            {
+                'value': r['category'],
+                'label': category_map.name(r['category']),
+                'count': r['count'],
+            }
+            for r in categories
+        ],
+        'priority': [
+            {'value': value, 'label': label, 'count': row[f'priority_{value}']}
+            for value, label in Product.PRIORITY_CHOICES
+        ],
+        'is_featured': [
+            {'value': True, 'count': row['featured']},
+            {'value': False, 'count': row['count'] - row['featured']},
+        ],
+        'price': [
+            {'min': money(low), 'max': money(high), 'count': row[f'price_{i}']}
+            for i, (low, high) in enumerate(buckets)
+        ],
+    }
+
+
+def cached_facet_counts(queryset, signature):
+    """`facet_counts(queryset)`, cached under `signature`: the filter
+    parameters plus whatever identifies the current data."""
+    signature = (signature, settings.CATALOG_FACET_PRICE_BUCKETS)
+    key = 'catalog:facets:' + hashlib.md5(
+        repr(signature).encode('utf-8')
+    ).hexdigest()
+    data = cache.get(key)
+    if data is None:
+        # From the primary: the counts are cached against its log position,
+        # so a lagging replica's would stick until the next write.
+        data = facet_counts(queryset.using(DEFAULT_DB_ALIAS))
+        cache.set(key, data, settings.CATALOG_FACETS_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,117 @@
+"""
+Precomputed feed of featured products.
+
+The `featured` endpoint pages through an ordered list of featured product
+keys kept in the default cache, so the home page never scans or sorts the
+products table. Each key is `(-priority, -created_at, -id)`, which sorts
+ascending into feed order: highest priority first, newest first within a
+priority.
+
+The list is stored with the position in the change log
+(catalog/changes.py) it reflects, and every read checks that position
+against the log's newest one, with one indexed query. When products have
+changed since, only those products are re-read and their keys replaced;
+after more than CATCH_UP_LIMIT changes the list is rebuilt instead. Each
+process may keep its own copy (the default cache is a per-process
+LocMemCache), and every copy catches up on writes made anywhere, as long
+as they reach the log: model signals and the bulk paths record them, and
+so must any other code writing products.
+
+The log position doubles as the feed's version for ETags. A page whose rows
+no longer match the list (a write that skipped the log) rebuilds it.
+"""
+from bisect import insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+
+from .models import CatalogChange, Product
+
+FEED_KEY = 'catalog:featured-feed'
+
+# Past this many product changes since the cached list, one rebuild query
+# over the featured rows beats re-reading the changed ones.
+CATCH_UP_LIMIT = 500
+
+
+def feed_key(priority, created_at, pk):
+    return (-priority, -created_at.timestamp(), -pk)
+
+
+def product_id(key):
+    return -key[2]
+
+
+def log_position():
+    """The newest position in the change log (0 when it is empty)."""
+    changes = CatalogChange.objects.using(DEFAULT_DB_ALIAS)
+    return changes.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def featured_rows(queryset):
+    # Always the primary, like the position: the list is cached against
+    # that position, so a lagging replica's rows would stick until the
+    # products change again.
+    return queryset.using(DEFAULT_DB_ALIAS).filter(
+        is_featured=True
+    ).values_list('priority', 'created_at', 'pk')
+
+
+def invalidate():
+    """Drop this process's copy; the next read rebuilds it."""
+    cache.delete(FEED_KEY)
+
+
+def rebuild(position=None):
+    if position is None:
+        position = log_position()
+    keys = sorted(feed_key(*row) for row in featured_rows(Product.objects))
+    _store(position, keys)
+    return keys
+
+
+def current():
+    """`(position, keys)`: the feed's keys, in order, as of change log
+    `position`, building or catching them up first if needed."""
+    # Read the position first: changes up to it are already in the rows
+    # read below, later ones are caught up on the next read.
+    position = log_position()
+    cached = cache.get(FEED_KEY)
+    if cached is None:
+        return position, rebuild(position)
+    seen, keys = cached
+    if seen == position:
+        return position, keys
+    changed = set(
+        CatalogChange.objects.using(DEFAULT_DB_ALIAS)
+        .filter(kind='product', seq__gt=seen)
+        .values_list('object_id', flat=True)[:CATCH_UP_LIMIT + 1]
+    )
+    if len(changed) > CATCH_UP_LIMIT:
+        return position, rebuild(position)
+    if changed:
+        keys = [key for key in keys if product_id(key) not in changed]
+        for row in featured_rows(Product.objects.filter(pk__in=changed)):
+            insort(keys, feed_key(*row))
+    _store(position, keys)
+    return position, keys
+
+
+def matches(keys, rows):
+    """Whether `rows` (values rows of featured products) are exactly the
+    products `keys` name, with the same priorities and creation times."""
+    by_id = {row['id']: row for row in rows}
+    return len(by_id) == len(keys) and all(
+        -pk in by_id
+        and feed_key(by_id[-pk]['priority'], by_id[-pk]['created_at'], -pk)
+        == (priority, created, pk)
+        for priority, created, pk in keys
+    )
+
+
+def _store(position, keys):
+    cache.set(
+        FEED_KEY, (position, keys), settings.CATALOG_FEATURED_FEED_TIMEOUT,
+    )
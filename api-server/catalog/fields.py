@@ -0,0 +1,63 @@
+"""
+Product priority as a model field that accepts labels as well as numbers.
+
+Priorities are stored as small integers (`Product.PRIORITY_CHOICES`) but
+arrive from API clients, CSV imports and the demo fixture as labels too
+('high', 'High') or numeric strings ('3'). `parse_priority` is the one
+place that turns any of those into a choice; `PriorityField` applies it when
+values are assigned through the ORM (fixtures, lookups, saves) and
+`serializers.PriorityChoiceField` when they arrive through the API.
+"""
+from django.core import exceptions
+from django.db import models
+
+
+def parse_priority(value, choices):
+    """
+    The choice value named by `value`: one of the values in `choices`, a
+    numeric string of one, or a label in any case. Raises `ValueError` for
+    anything else.
+    """
+    if isinstance(value, str):
+        key = value.strip().lower()
+        labels = {str(label).lower(): choice for choice, label in choices}
+        value = int(key) if key.isdigit() else labels.get(key, value)
+    # Exactly int: True and 3.0 compare equal to choices but are not ones.
+    if type(value) is int and value in {c for c, _ in choices}:
+        return value
+    raise ValueError(f'{value!r} is not a valid priority.')
+
+
+class PriorityField(models.PositiveSmallIntegerField):
+    """A small integer choice that also accepts the choices' labels."""
+
+    def parse(self, value):
+        return parse_priority(value, self.flatchoices)
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            return self.parse(value)
+        except ValueError:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        if isinstance(value, (str, float, bool)):
+            try:
+                value = self.parse(value)
+            except ValueError as exc:
+                raise ValueError(f"Field '{self.name}': {exc}") from exc
+        return super().get_prep_value(value)
+
+    def pre_save(self, model_instance, add):
+        # Normalize the instance too, so it reads back what was stored.
+        value = getattr(model_instance, self.attname)
+        if isinstance(value, str):
+            value = self.get_prep_value(value)
+            setattr(model_instance, self.attname, value)
+        return value
@@ -0,0 +1,200 @@
+"""
+Streaming bulk product import from NDJSON or CSV.
+
+Input is consumed line by line and processed in chunks of `batch_size`
+rows: each chunk is validated with `ProductImportSerializer`, resolves its
+categories and existing products with one query each, and is written with
+`bulk_create` / `bulk_update` in its own transaction. Only the current
+chunk and the per-row error reports are held in memory.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import changes
+from .categories import category_map
+from .models import Cart, Product
+from .serializers import ProductImportSerializer
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+DEFAULT_BATCH_SIZE = 1000
+
+
+def decode_lines(lines):
+    """Decode an iterable of byte (or text) lines as UTF-8, dropping a BOM."""
+    for number, line in enumerate(lines):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig' if number == 0 else 'utf-8')
+        yield line
+
+
+def read_ndjson(lines):
+    """Yield `(row number, record, error)` for each non-blank line."""
+    for number, line in enumerate(decode_lines(lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(record, dict):
+            yield number, None, {
+                'non_field_errors': ['Each line must be a JSON object.']
+            }
+            continue
+        yield number, record, None
+
+
+def read_csv(lines):
+    """Yield `(row number, record, error)` for each CSV data row; the first
+    row is the header. Empty cells are omitted so field defaults apply."""
+    reader = csv.DictReader(decode_lines(lines))
+    for number, row in enumerate(reader, start=1):
+        record = {
+            key: value for key, value in row.items()
+            if key and value not in ('', None)
+        }
+        yield number, record, None
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'errors': self.errors,
+        }
+
+
+def import_products(lines, fmt, batch_size=DEFAULT_BATCH_SIZE):
+    """Import products from `lines` in `fmt` ('ndjson' or 'csv')."""
+    result = ImportResult()
+    rows = READERS[fmt](lines)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return result
+        _import_chunk(chunk, batch_size, result)
+
+
+def _import_chunk(chunk, batch_size, result):
+    errors = []
+    try:
+        _write_chunk(chunk, batch_size, result, errors)
+    finally:
+        result.errors.extend(sorted(errors, key=lambda error: error['row']))
+
+
+def _write_chunk(chunk, batch_size, result, errors):
+    valid = []
+    for number, record, error in chunk:
+        if error is not None:
+            errors.append({'row': number, 'errors': error})
+            continue
+        serializer = ProductImportSerializer(
+            data=record, partial='id' in record
+        )
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            errors.append({'row': number, 'errors': serializer.errors})
+    if not valid:
+        return
+
+    categories = _resolve_categories(data['category'] for _, data in valid
+                                     if 'category' in data)
+    existing = Product.objects.in_bulk(
+        [data['id'] for _, data in valid if 'id' in data]
+    )
+
+    now = timezone.now()
+    to_create, to_update, update_fields = [], [], {'updated_at'}
+    for number, data in valid:
+        data = dict(data)
+        if 'category' in data:
+            category = categories.get(data['category'])
+            if category is None:
+                errors.append({
+                    'row': number,
+                    'errors': {'category': ['Unknown category.']},
+                })
+                continue
+            data['category'] = category
+        if 'id' in data:
+            product = existing.get(data.pop('id'))
+            if product is None:
+                errors.append({
+                    'row': number, 'errors': {'id': ['Product not found.']},
+                })
+                continue
+            for field, value in data.items():
+                setattr(product, field, value)
+            # bulk_update() does not run auto_now.
+            product.updated_at = now
+            update_fields.update(data)
+            to_update.append(product)
+        else:
+            to_create.append(Product(**data))
+
+    with transaction.atomic():
+        if to_create:
+            # bulk_create() leaves primary keys unset on SQLite; new rows
+            # are the ones above the current highest key.
+            last_pk = (
+                Product.objects.order_by('-pk')
+                .values_list('pk', flat=True).first() or 0
+            )
+            Product.objects.bulk_create(to_create, batch_size=batch_size)
+            changes.record_queryset(Product.objects.filter(pk__gt=last_pk))
+        if to_update:
+            Product.objects.bulk_update(
+                to_update, sorted(update_fields), batch_size=batch_size
+            )
+            changes.record(Product, [product.pk for product in to_update])
+        # bulk_create() / bulk_update() send no signals.
+        if to_update and 'price' in update_fields:
+            carts = Cart.objects.filter(items__product__in=to_update)
+            carts.recompute_totals()
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def _resolve_categories(references):
+    """Map each category reference (id or name) to a Category from the
+    category map; unknown references are left out."""
+    references = set(references)
+    resolved = {}
+    snapshot = category_map.current()
+    for _ in range(2):
+        by_name = {}
+        for category in snapshot.categories():
+            by_name.setdefault(category.name, category)
+        for ref in references:
+            if ref.isdigit():
+                category = snapshot.by_id.get(int(ref))
+            else:
+                category = by_name.get(ref)
+            if category is not None:
+                resolved[ref] = category
+        if len(resolved) == len(references):
+            break
+        # Possibly created by another process since the map was loaded.
+        snapshot = category_map.current(reload=True)
+    return resolved
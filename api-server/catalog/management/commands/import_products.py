@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importers import DEFAULT_BATCH_SIZE, FORMATS, import_products
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to import')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='input format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='rows validated and written per batch',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        try:
+            with open(path, 'rb') as lines:
+                result = import_products(
+                    lines, fmt, batch_size=options['batch_size']
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in result.errors:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created}, updated {result.updated}, '
+            f'{len(result.errors)} rows failed.'
+        ))
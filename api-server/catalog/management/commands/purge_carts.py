@@ -0,0 +1,108 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from catalog.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete carts (and their items) not updated within the TTL, in "
+        "bounded batches; safe to run on a schedule"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float, default=settings.CATALOG_CART_TTL_DAYS,
+            help='delete carts not updated for this many days (default: '
+                 'CATALOG_CART_TTL_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='carts deleted per transaction',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='seconds to sleep between batches, letting other writers in',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only count the carts that would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        max_params = connection.features.max_query_params
+        if max_params and batch_size > max_params:
+            raise CommandError(
+                f'--batch-size must be at most {max_params} on '
+                f'{connection.vendor}'
+            )
+        if options['days'] < 0 or options['pause'] < 0:
+            raise CommandError('--days and --pause must not be negative')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Oldest first along cart_updated_idx.
+        abandoned = (
+            Cart.objects.filter(updated_at__lt=cutoff).order_by('updated_at')
+        )
+        if options['dry_run']:
+            carts = abandoned.count()
+            items = CartItem.objects.filter(cart__in=abandoned).count()
+            self.stdout.write(
+                f'Would delete {carts} carts and {items} cart items not '
+                f'updated since {cutoff:%Y-%m-%d %H:%M}.'
+            )
+            return
+
+        start = time.perf_counter()
+        carts = items = batches = 0
+        longest = 0.0
+        while True:
+            batch_start = time.perf_counter()
+            # One short write transaction per batch, so on SQLite other
+            # writers wait for at most one batch rather than the whole purge.
+            with transaction.atomic():
+                pks = list(
+                    abandoned.select_for_update()
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                # Children first, one DELETE each. `QuerySet.delete()` would
+                # load every cart to cascade to its items, which costs more
+                # than the deletes themselves.
+                items += self.delete_rows(CartItem, 'cart', pks)
+                carts += self.delete_rows(Cart, 'id', pks)
+            batches += 1
+            longest = max(longest, time.perf_counter() - batch_start)
+            if len(pks) < batch_size:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {carts} carts and {items} cart items in {batches} '
+            f'batches ({time.perf_counter() - start:.2f}s, longest batch '
+            f'{longest * 1000:.0f}ms).'
+        ))
+
+    def delete_rows(self, model, field, pks):
+        """Delete the rows of `model` whose `field` is in `pks`."""
+        quote = connection.ops.quote_name
+        column = model._meta.get_field(field).column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE {} IN ({})'.format(
+                    quote(model._meta.db_table), quote(column),
+                    ', '.join(['%s'] * len(pks)),
+                ),
+                pks,
+            )
+            return cursor.rowcount
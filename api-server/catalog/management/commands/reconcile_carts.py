@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        "Report carts whose stored subtotal or item count differs from "
+        "their items; repair them with --fix"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='recompute the totals of every drifted cart',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='carts read and repaired per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer')
+
+        carts = (
+            Cart.objects.with_computed_totals().order_by('pk')
+            .values_list(
+                'pk', 'subtotal', 'item_count',
+                'computed_subtotal', 'computed_item_count',
+            )
+        )
+        checked, drifted = 0, []
+        for pk, subtotal, count, expected_subtotal, expected_count in (
+            carts.iterator(chunk_size=batch_size)
+        ):
+            checked += 1
+            if (subtotal, count) != (expected_subtotal, expected_count):
+                drifted.append(pk)
+                self.stdout.write(
+                    f'cart {pk}: stored {subtotal} for {count} items, '
+                    f'expected {expected_subtotal} for {expected_count}'
+                )
+
+        if options['fix']:
+            for start in range(0, len(drifted), batch_size):
+                batch = drifted[start:start + batch_size]
+                Cart.objects.filter(pk__in=batch).recompute_totals()
+            self.stdout.write(self.style.SUCCESS(
+                f'Checked {checked} carts, repaired {len(drifted)}.'
+            ))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(
+                f'Checked {checked} carts, {len(drifted)} drifted; '
+                f'run with --fix to repair them.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Checked {checked} carts, none drifted.'
+            ))
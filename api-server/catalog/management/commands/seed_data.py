@@ -1,72 +1,89 @@
-from django.core.management.base import BaseCommand
-from django.core.management import call_command
 import json
 import os
-import tempfile
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
 
-# Map human labels to numeric choices used by Product.PRIORITY_CHOICES
-PRIORITY_MAP = {
-    'low': 1,
-    'medium': 2,
-    'high': 3,
-    'critical': 4,
-}
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog import changes
+from catalog.categories import bump_version
+from catalog.models import Cart, CartItem, Category, Product
+from catalog.search import fts_sync_deferred
+
+FIXTURE = os.path.normpath(os.path.join(
+    os.path.dirname(__file__), '..', '..', 'fixtures', 'initial_data.json'
+))
+
+# Synthetic timestamps fall in the year before this instant, so equal seeds
+# give equal rows regardless of when the command runs.
+# Naive UTC, the form Django stores datetimes in on SQLite.
+EPOCH = datetime(2025, 1, 1)
+
+# Vocabulary for synthetic rows; varied enough to give search something to
+# rank and category names something to tell apart.
+ADJECTIVES = [
+    'Classic', 'Compact', 'Deluxe', 'Eco', 'Ergonomic', 'Foldable', 'Heavy',
+    'Lightweight', 'Modern', 'Portable', 'Premium', 'Rugged', 'Smart',
+    'Vintage', 'Wireless',
+]
+NOUNS = [
+    'Backpack', 'Blender', 'Camera', 'Chair', 'Desk', 'Headphones', 'Jacket',
+    'Kettle', 'Lamp', 'Monitor', 'Notebook', 'Speaker', 'Sneakers', 'Tent',
+    'Watch',
+]
+DEPARTMENTS = [
+    'Electronics', 'Clothing', 'Home', 'Books', 'Sports', 'Garden', 'Toys',
+    'Beauty', 'Grocery', 'Office',
+]
+WORDS = [
+    'durable', 'stylish', 'versatile', 'everyday', 'travel', 'outdoor',
+    'office', 'gift', 'quality', 'comfortable', 'design', 'battery',
+    'warranty', 'cotton', 'steel', 'recycled',
+]
+# Most products are medium priority; few are critical.
+PRIORITY_WEIGHTS = [(1, 3), (2, 4), (3, 2), (4, 1)]
 
 
 class Command(BaseCommand):
-    help = 'Initialize database with sample data'
+    help = (
+        'Initialize database with sample data. Without --products the '
+        '15-product demo fixture is loaded; with it, a deterministic '
+        'synthetic catalog of that size is generated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int,
+            help='generate this many synthetic products instead of the fixture',
+        )
+        parser.add_argument(
+            '--categories', type=int, default=10,
+            help='synthetic categories (default: 10)',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=0,
+            help='synthetic carts, each holding 1-5 products (default: 0)',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='random seed; equal seeds produce equal data (default: 0)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='rows per INSERT batch (default: 5000)',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Loading initial data...')
-        
-        try:
-            # Ensure deterministic re-seeding: remove existing categories/products
-            try:
-                from catalog.models import Category, Product
-                Product.objects.all().delete()
-                Category.objects.all().delete()
-            except Exception:
-                # If models are not available for some reason, continue to loaddata
-                pass
-
-            # Load fixture file, coerce string priority labels to numeric choices
-            fixtures_dir = os.path.normpath(
-                os.path.join(os.path.dirname(__file__), '..', '..', 'fixtures')
-            )
-            src_fixture = os.path.join(fixtures_dir, 'initial_data.json')
-
-            with open(src_fixture, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            changed = False
-            for obj in data:
-                if obj.get('model') == 'catalog.product':
-                    fields = obj.get('fields', {})
-                    pv = fields.get('priority')
-                    if isinstance(pv, str):
-                        key = pv.strip().lower()
-                        if key.isdigit():
-                            fields['priority'] = int(key)
-                            changed = True
-                        elif key in PRIORITY_MAP:
-                            fields['priority'] = PRIORITY_MAP[key]
-                            changed = True
-
-            # Write to a temporary fixture if we changed values, otherwise use original
-            if changed:
-                tf = tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w', encoding='utf-8')
-                json.dump(data, tf, ensure_ascii=False, indent=2)
-                tf_name = tf.name
-                tf.close()
-                try:
-                    call_command('loaddata', tf_name, verbosity=0)
-                finally:
-                    try:
-                        os.unlink(tf_name)
-                    except Exception:
-                        pass
-            else:
-                call_command('loaddata', src_fixture, verbosity=0)
+        if options['products'] is None:
+            self.stdout.write('Loading initial data...')
+            with transaction.atomic():
+                self.wipe()
+                self.load_fixture()
+            bump_version()
             self.stdout.write(self.style.SUCCESS(
                 'Successfully loaded sample data!'
             ))
@@ -76,6 +93,167 @@ class Command(BaseCommand):
             self.stdout.write('\nYou can now:')
             self.stdout.write('  • Visit http://localhost:8000/api/products/')
             self.stdout.write('  • Visit http://localhost:8000/admin/')
-            
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error loading data: {e}'))
+            return
+
+        products, categories = options['products'], options['categories']
+        carts, batch_size = options['carts'], options['batch_size']
+        if min(products, carts) < 0 or categories < 1 or batch_size < 1:
+            raise CommandError(
+                '--products/--carts must be >= 0, --categories and '
+                '--batch-size >= 1'
+            )
+        if carts and not products:
+            raise CommandError('--carts needs at least one product')
+
+        if connection.vendor == 'sqlite':
+            # A 256 MiB page cache keeps the product indexes in memory
+            # while they grow; the default 2 MiB thrashes past ~100k rows.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        # Rows go in parents-first and are wiped children-first, so foreign
+        # keys hold throughout; checking them per row on SQLite also rules
+        # out its fast whole-table DELETE.
+        with connection.constraint_checks_disabled(), \
+                transaction.atomic(), fts_sync_deferred(connection):
+            self.wipe()
+            self.insert(
+                Category, ['id', 'name', 'description', 'created_at',
+                           'updated_at'],
+                self.categories(rng, categories), batch_size,
+            )
+            self.insert(
+                Product, ['id', 'title', 'description', 'category',
+                          'price', 'priority', 'is_featured', 'image_url',
+                          'quantity', 'created_at', 'updated_at'],
+                self.products(rng, products, categories), batch_size,
+            )
+            self.insert(
+                Cart, ['id', 'subtotal', 'item_count', 'created_at',
+                       'updated_at'],
+                self.carts(rng, carts), batch_size,
+            )
+            self.insert(
+                CartItem, ['cart', 'product', 'quantity', 'created_at'],
+                self.cart_items(rng, carts, products), batch_size,
+            )
+            # Carts go in empty; fill their totals in one set-based UPDATE.
+            Cart.objects.recompute_totals()
+            changes.record_queryset(Category.objects.all())
+            changes.record_queryset(Product.objects.all())
+        # Raw SQL sends no signals. Other processes pick the categories up
+        # from the log; this one reloads its map now.
+        bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {categories} categories, {products} products and '
+            f'{carts} carts (seed {options["seed"]}) in '
+            f'{time.perf_counter() - start:.1f}s'
+        ))
+
+    def wipe(self):
+        """Empty the catalog tables with one DELETE each.
+
+        `QuerySet.delete()` would load every product to cascade to cart
+        items row by row; deleting children first makes that unnecessary.
+        Products and categories are logged as deleted first; those loaded
+        again come back as changes.
+        """
+        changes.record_queryset(Product.objects.all(), deleted=True)
+        changes.record_queryset(Category.objects.all(), deleted=True)
+        with connection.cursor() as cursor:
+            for model in (CartItem, Cart, Product, Category):
+                table = connection.ops.quote_name(model._meta.db_table)
+                cursor.execute(f'DELETE FROM {table}')
+
+    def load_fixture(self):
+        """Load the demo fixture. Its priority labels ('high') need no
+        coercion: PriorityField parses them on deserialization."""
+        with open(FIXTURE, encoding='utf-8') as handle:
+            data = json.load(handle)
+        for obj in data:
+            fields = obj.get('fields', {})
+            # Raw fixture saves skip auto_now; rows written before a model
+            # had `updated_at` take their creation time.
+            if 'created_at' in fields:
+                fields.setdefault('updated_at', fields['created_at'])
+        for obj in serializers.deserialize('python', data):
+            obj.save()
+
+    def insert(self, model, fields, rows, batch_size):
+        """Insert `rows` (tuples of database values for `fields`) with one
+        `executemany` per batch.
+
+        `bulk_create` compiles every row through the ORM, which costs more
+        than SQLite spends storing it; synthetic rows are already in their
+        database form, so they skip that step.
+        """
+        opts = model._meta
+        quote = connection.ops.quote_name
+        columns = [quote(opts.get_field(name).column) for name in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(opts.db_table),
+            ', '.join(columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    return
+                cursor.executemany(sql, batch)
+
+    def timestamps(self, count):
+        """Creation times spread over the year before EPOCH, increasing with
+        the row id like real inserts do (which also keeps index inserts on
+        `created_at` appending at the end of the b-tree)."""
+        step = timedelta(days=365) / max(count, 1)
+        start = EPOCH - timedelta(days=365)
+        for i in range(1, count + 1):
+            yield str(start + step * i)
+
+    def categories(self, rng, count):
+        for i, created in enumerate(self.timestamps(count), start=1):
+            department = DEPARTMENTS[(i - 1) % len(DEPARTMENTS)]
+            name = department if count <= len(DEPARTMENTS) else f'{department} {i}'
+            description = ' '.join(rng.choices(WORDS, k=6)).capitalize()
+            yield i, name, description, created, created
+
+    def products(self, rng, count, categories):
+        # Draw everything from rng.random() and a pool of pre-built
+        # descriptions: the random module's helpers cost more per row than
+        # the INSERT does.
+        rand = rng.random
+        blurbs = [' '.join(rng.choices(WORDS, k=8)) for _ in range(1024)]
+        priorities = [
+            priority for priority, weight in PRIORITY_WEIGHTS
+            for _ in range(weight)
+        ]
+        for i, created in enumerate(self.timestamps(count), start=1):
+            noun = NOUNS[int(rand() * len(NOUNS))]
+            adjective = ADJECTIVES[int(rand() * len(ADJECTIVES))]
+            cents = 99 + int(rand() * 99901)
+            yield (
+                i,
+                f'{adjective} {noun} {i}',
+                f'{noun} for {blurbs[int(rand() * len(blurbs))]}.',
+                1 + int(rand() * categories),
+                f'{cents // 100}.{cents % 100:02d}',
+                priorities[int(rand() * len(priorities))],
+                rand() < 0.05,
+                f'https://picsum.photos/seed/{i}/400/400',
+                int(rand() * 201),
+                created,
+                created,
+            )
+
+    def carts(self, rng, count):
+        for i, created in enumerate(self.timestamps(count), start=1):
+            yield i, '0.00', 0, created, created
+
+    def cart_items(self, rng, carts, products):
+        for cart_id, created in enumerate(self.timestamps(carts), start=1):
+            size = min(products, rng.randint(1, 5))
+            for product_id in rng.sample(range(1, products + 1), size):
+                yield cart_id, product_id, rng.randint(1, 3), created
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_change_priority_field'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                fields=['-created_at'], name='product_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                fields=['category', '-created_at'],
+                name='product_cat_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                fields=['category', 'price'], name='product_cat_price_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                fields=['priority', '-created_at'],
+                name='product_prio_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                fields=['is_featured', '-created_at'],
+                name='product_feat_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                condition=models.Q(is_featured=True),
+                fields=['-created_at'],
+                name='product_featured_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    Category.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(
+                auto_now=True, default=None, null=True,
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import (
+    DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce
+
+MONEY_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def compute_totals(apps, schema_editor):
+    Cart = apps.get_model('catalog', 'Cart')
+    CartItem = apps.get_model('catalog', 'CartItem')
+    lines = (
+        CartItem.objects.filter(cart=OuterRef('pk')).order_by()
+        .values('cart')
+    )
+    subtotal = lines.annotate(total=Sum(ExpressionWrapper(
+        F('quantity') * F('product__price'), output_field=MONEY_FIELD,
+    ))).values('total')
+    item_count = lines.annotate(total=Sum('quantity')).values('total')
+    Cart.objects.update(
+        subtotal=Coalesce(
+            Subquery(subtotal, output_field=MONEY_FIELD),
+            Value(Decimal('0.00')), output_field=MONEY_FIELD,
+        ),
+        item_count=Coalesce(Subquery(item_count), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal('0.00'), max_digits=14,
+            ),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(compute_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.utils import timezone
+
+import catalog.fields
+
+PRIORITY_CHOICES = [
+    (1, 'Low'),
+    (2, 'Medium'),
+    (3, 'High'),
+    (4, 'Critical'),
+]
+
+
+def normalize_priorities(apps, schema_editor):
+    # SQLite stores whatever it is given in an integer column, so rows saved
+    # before PriorityField may hold labels ('high') or numeric strings.
+    # Other databases could never store them.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('catalog', 'Product')
+    table = connection.ops.quote_name(Product._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, priority FROM {table} "
+            f"WHERE typeof(priority) != 'integer'"
+        )
+        rows = cursor.fetchall()
+    default = Product._meta.get_field('priority').default
+    now = timezone.now()
+    for pk, value in rows:
+        try:
+            priority = catalog.fields.parse_priority(value, PRIORITY_CHOICES)
+        except ValueError:
+            priority = default
+        # A new updated_at invalidates cached payloads carrying the label.
+        Product.objects.filter(pk=pk).update(priority=priority, updated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_cart_updated_index'),
+    ]
+
+    operations = [
+        # The column is unchanged. Altering it for real would make SQLite
+        # rebuild catalog_product, dropping the search index triggers.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='product',
+                name='priority',
+                field=catalog.fields.PriorityField(
+                    choices=PRIORITY_CHOICES, default=2,
+                ),
+            ),
+        ]),
+        migrations.RunPython(normalize_priorities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+
+def record_existing(apps, schema_editor):
+    # Every existing category and product enters the log once, so a client
+    # syncing from cursor 0 receives the whole catalog. One INSERT ... SELECT
+    # per table, so no rows pass through Python.
+    CatalogChange = apps.get_model('catalog', 'CatalogChange')
+    quote = schema_editor.connection.ops.quote_name
+    table = quote(CatalogChange._meta.db_table)
+    for kind in ('category', 'product'):
+        model = apps.get_model('catalog', kind)
+        source = quote(model._meta.db_table)
+        pk = quote(model._meta.pk.column)
+        schema_editor.execute(
+            f'INSERT INTO {table} (kind, object_id, deleted, seq) '
+            f'SELECT %s, {pk}, %s, '
+            f'(SELECT COALESCE(MAX(seq), 0) FROM {table}) '
+            f'+ ROW_NUMBER() OVER (ORDER BY {pk}) FROM {source}',
+            [kind, False],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_priority_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('seq', models.PositiveBigIntegerField(unique=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='catalogchange',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='change_object_uniq'),
+        ),
+        migrations.RunPython(record_existing, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,21 @@
 # catalog/models.py
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, router, transaction
+from django.db.models import (
+    DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .fields import PriorityField
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -23,9 +33,8 @@ class Product(models.Model):
     description = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    priority = models.PositiveSmallIntegerField(
-        choices=PRIORITY_CHOICES, default=2
-    )
+    # Accepts labels ('high') as well as numbers; see catalog/fields.py.
+    priority = PriorityField(choices=PRIORITY_CHOICES, default=2)
     is_featured = models.BooleanField(default=False)
     image_url = models.URLField(blank=True)
     # Available stock quantity for the product (for cart stock checks).
@@ -33,33 +42,131 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Back the ProductViewSet filterset/ordering combinations; every
+        # filter index ends in created_at to serve the default ordering.
+        indexes = [
+            models.Index(fields=['-created_at'], name='product_created_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(
+                fields=['category', '-created_at'],
+                name='product_cat_created_idx',
+            ),
+            models.Index(
+                fields=['category', 'price'], name='product_cat_price_idx',
+            ),
+            models.Index(
+                fields=['priority', '-created_at'],
+                name='product_prio_created_idx',
+            ),
+            models.Index(
+                fields=['is_featured', '-created_at'],
+                name='product_feat_created_idx',
+            ),
+            # Partial index backing the `featured` action.
+            models.Index(
+                fields=['-created_at'],
+                name='product_featured_idx',
+                condition=models.Q(is_featured=True),
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        # The stored price, so saves can tell whether carts need repricing
+        # (see signals.product_price_changed).
+        product._saved_price = product.__dict__.get('price')
+        return product
     
-    def save(self, *args, **kwargs):
+
+class CatalogChange(models.Model):
+    """The latest change to one product or category, read by the delta-sync
+    feed (see catalog/changes.py). Each object keeps a single row; every new
+    change moves it to the end of the log with a new `seq`."""
+    kind = models.CharField(max_length=20)  # the model name
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    # Position in the log, catalog-wide; clients' cursors are the last one
+    # they have seen. Unique, so the feed reads it from its index.
+    seq = models.PositiveBigIntegerField(unique=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='change_object_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"{self.seq}: {self.kind} {self.object_id} {action}"
+
+
+MONEY_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def line_total(product_id, quantity):
+    """`quantity` (a number or an expression) units of a product at its
+    current price, as an expression evaluated by the database."""
+    price = Product.objects.filter(pk=product_id).values('price')[:1]
+    if not hasattr(quantity, 'resolve_expression'):
+        quantity = Value(quantity)
+    return ExpressionWrapper(
+        Subquery(price, output_field=MONEY_FIELD) * quantity,
+        output_field=MONEY_FIELD,
+    )
+
+
+def computed_totals():
+    """Expressions for a cart's subtotal (sum of quantity x current product
+    price) and item count (sum of quantities), aggregated from its items."""
+    lines = (
+        CartItem.objects.filter(cart=OuterRef('pk')).order_by()
+        .values('cart')
+    )
+    subtotal = lines.annotate(total=Sum(ExpressionWrapper(
+        F('quantity') * F('product__price'), output_field=MONEY_FIELD,
+    ))).values('total')
+    item_count = lines.annotate(total=Sum('quantity')).values('total')
+    return {
+        'subtotal': Coalesce(
+            Subquery(subtotal, output_field=MONEY_FIELD),
+            Value(Decimal('0.00')), output_field=MONEY_FIELD,
+        ),
+        'item_count': Coalesce(Subquery(item_count), Value(0)),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    def adjust_totals(self, subtotal, item_count):
         """
-        Accept human-friendly string labels for `priority` (e.g. 'high') and
-        coerce them to the numeric choice before saving. This makes saves
-        tolerant of fixtures or external input that use string labels.
+        Add `subtotal` (an amount or expression) and `item_count` to the
+        stored totals and mark the carts updated, in one UPDATE that is safe
+        against concurrent adjustments.
         """
-        if isinstance(self.priority, str):
-            key = self.priority.strip().lower()
-            mapping = {
-                'low': 1,
-                'medium': 2,
-                'high': 3,
-                'critical': 4,
-            }
-            if key.isdigit():
-                try:
-                    self.priority = int(key)
-                except ValueError:
-                    self.priority = mapping.get(key, self.priority)
-            else:
-                self.priority = mapping.get(key, self.priority)
-
-        super().save(*args, **kwargs)
-    
+        return self.update(
+            subtotal=F('subtotal') + subtotal,
+            item_count=F('item_count') + item_count,
+            updated_at=timezone.now(),
+        )
+
+    def recompute_totals(self):
+        """Recompute the stored totals from the carts' items and current
+        prices, in one UPDATE. Carts are not marked updated."""
+        return self.update(**computed_totals())
+
+    def with_computed_totals(self):
+        """Annotate `computed_subtotal` and `computed_item_count`, the totals
+        the stored ones should equal."""
+        return self.annotate(**{
+            f'computed_{name}': expression
+            for name, expression in computed_totals().items()
+        })
+
 
 class Cart(models.Model):
     """Simple cart model. Can be extended to link to a user."""
@@ -70,9 +177,27 @@ class Cart(models.Model):
     #     blank=True,
     #     on_delete=models.SET_NULL,
     # )
+    # Denormalized from the cart's items: sum of quantity x current product
+    # price, and sum of quantities. Item saves and deletes, the batch and
+    # checkout paths adjust them in the same transaction as the items;
+    # product price changes recompute the carts holding the product.
+    # `manage.py reconcile_carts` reports and repairs drift.
+    subtotal = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0.00'),
+    )
+    item_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Backs `manage.py purge_carts`, which finds abandoned carts by
+            # their last update.
+            models.Index(fields=['updated_at'], name='cart_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Cart {self.pk}"
 
@@ -90,4 +215,48 @@ class CartItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.product.title} (cart {self.cart_id})"
-    
\ No newline at end of file
+
+    def stored_quantity(self):
+        """The line's quantity as currently stored, as an expression the
+        database evaluates (0 for a line not saved yet)."""
+        if self._state.adding:
+            return Value(0)
+        stored = CartItem.objects.filter(pk=self.pk).values('quantity')[:1]
+        return Coalesce(Subquery(stored), Value(0))
+
+    def totals_transaction(self):
+        # No savepoint: nothing recovers from a failed write halfway, so an
+        # enclosing transaction is simply marked for rollback.
+        return transaction.atomic(
+            using=router.db_for_write(CartItem), savepoint=False,
+        )
+
+    def save(self, *args, **kwargs):
+        """Save the line and adjust its cart's totals in one transaction.
+        Bulk writes (`bulk_create`, `bulk_update`, `QuerySet.update()`) skip
+        this and must call `CartQuerySet.adjust_totals()` themselves."""
+        with self.totals_transaction():
+            # By the difference from the stored quantity, read by the same
+            # UPDATE and ahead of the line's own write: a concurrent save
+            # of this line can no longer be counted twice.
+            delta = ExpressionWrapper(
+                Value(self.quantity) - self.stored_quantity(),
+                output_field=models.IntegerField(),
+            )
+            Cart.objects.filter(pk=self.cart_id).adjust_totals(
+                line_total(self.product_id, delta), delta,
+            )
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Delete the line and take it out of its cart's totals. Like
+        saves, `QuerySet.delete()` and cascades skip this."""
+        with self.totals_transaction():
+            removed = ExpressionWrapper(
+                Value(0) - self.stored_quantity(),
+                output_field=models.IntegerField(),
+            )
+            Cart.objects.filter(pk=self.cart_id).adjust_totals(
+                line_total(self.product_id, removed), removed,
+            )
+            return super().delete(*args, **kwargs)
@@ -0,0 +1,171 @@
+"""
+Pagination for the catalog viewsets.
+
+Page-number pagination stays the default. Clients opt in to keyset (cursor)
+pagination with `?pagination=cursor` (or by following a `cursor` link):
+pages are fetched with an indexed range condition on `(ordering field, id)`
+instead of `COUNT(*)` + `OFFSET`, so page N costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the active ordering field plus the primary
+    key as a tie-breaker. The ordering field must be one of the view's
+    `ordering_fields` (or its default `ordering`); anything else, such as a
+    relevance rank, falls back to the view's default ordering.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.field, self.descending = self.get_key(queryset, view)
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor['reverse'])
+
+        # Walking backwards flips the scan direction; rows are re-reversed
+        # below so every page is returned in the requested order.
+        descending = self.descending != self.reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+        if cursor is not None:
+            queryset = queryset.filter(
+                self.after(cursor['value'], cursor['pk'], descending)
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.rows = rows
+        return rows
+
+    def get_key(self, queryset, view):
+        allowed = set(getattr(view, 'ordering_fields', None) or [])
+        default = getattr(view, 'ordering', None) or [self.default_ordering]
+        if isinstance(default, str):
+            default = [default]
+        allowed.add(default[0].lstrip('-'))
+        ordering = list(queryset.query.order_by) or default
+        key = ordering[0]
+        if key.lstrip('-') not in allowed:
+            key = default[0]
+        return key.lstrip('-'), key.startswith('-')
+
+    def after(self, value, pk, descending):
+        """Rows strictly after `(value, pk)` in the scan direction. The
+        redundant bound on the field alone lets the database seek its index
+        straight to the cursor instead of filtering from the top."""
+        op = 'lt' if descending else 'gt'
+        bound = 'lte' if descending else 'gte'
+        return Q(**{f'{self.field}__{bound}': value}) & (
+            Q(**{f'{self.field}__{op}': value})
+            | Q(**{self.field: value, f'pk__{op}': pk})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            field, value, pk, reverse = json.loads(raw.decode('utf-8'))
+            if field != self.field:
+                raise ValueError(field)
+            return {
+                'value': self.model._meta.get_field(field).to_python(value),
+                'pk': int(pk),
+                'reverse': bool(reverse),
+            }
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        # Rows may be model instances or `values()` dicts.
+        if isinstance(row, dict):
+            value, pk = row[self.field], row['id']
+        else:
+            value, pk = getattr(row, self.field), row.pk
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        else:
+            value = str(value)
+        raw = json.dumps([self.field, value, pk, int(reverse)])
+        encoded = base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class CatalogPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset mode."""
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        params = request.query_params
+        return (
+            params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,70 @@
+"""
+JSON renderer backed by orjson when it is installed.
+
+orjson is an optional dependency (`pip install orjson`); without it the
+renderer behaves exactly like DRF's `JSONRenderer`. Values orjson does not
+handle natively (Decimal, lazy strings, datetimes left unformatted by a
+serializer) go through DRF's encoder so the output does not change.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .exporters import EXPORTERS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Indented (browsable/debug) output keeps the stdlib path.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        encoder = self.encoder_class()
+        ret = orjson.dumps(
+            data,
+            default=encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # Match JSONRenderer, which escapes these for JavaScript consumers.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Selects an export format through `?format=` / `Accept`. Exports are
+    streamed by the view; `render()` only handles ordinary payloads such as
+    error responses.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        if self.format == 'csv':
+            # Error payloads map fields to lists of messages.
+            rows = [
+                {
+                    key: '; '.join(map(str, value))
+                    if isinstance(value, list) else value
+                    for key, value in row.items()
+                }
+                for row in rows
+            ]
+        return b''.join(EXPORTERS[self.format](rows, len(rows) or 1))
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
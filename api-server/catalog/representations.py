@@ -0,0 +1,50 @@
+"""
+Read-optimized representations built straight from `values()` rows.
+
+`ValuesRepresentation` reads a serializer's readable fields once and then
+turns plain database rows into the same output `to_representation()` would
+produce, without instantiating models or walking DRF's per-field attribute
+lookup. Each field's own `to_representation()` still formats the value, so
+the JSON is byte-for-byte what the regular serializer emits.
+"""
+from functools import lru_cache
+
+from rest_framework.relations import PrimaryKeyRelatedField
+
+
+class ValuesRepresentation:
+    """Build `serializer_class` output from rows of `queryset.values()`."""
+
+    def __init__(self, serializer_class):
+        self.columns = []
+        for field in serializer_class().fields.values():
+            if field.write_only:
+                continue
+            lookup = field.source.replace('.', '__')
+            if isinstance(field, PrimaryKeyRelatedField):
+                # values('category') already yields the related pk.
+                convert = None
+            else:
+                convert = field.to_representation
+            self.columns.append((field.field_name, lookup, convert))
+        self.lookups = [lookup for _, lookup, _ in self.columns]
+
+    def build(self, row):
+        data = {}
+        for name, lookup, convert in self.columns:
+            value = row[lookup]
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    def for_pks(self, queryset, pks):
+        """Return `{pk: representation}` for `pks`, in one query."""
+        rows = queryset.filter(pk__in=pks).values('pk', *self.lookups)
+        return {row['pk']: self.build(row) for row in rows}
+
+
+@lru_cache(maxsize=None)
+def values_representation(serializer_class):
+    """Shared `ValuesRepresentation` per serializer class."""
+    return ValuesRepresentation(serializer_class)
@@ -0,0 +1,116 @@
+"""
+Full-text product search backed by an SQLite FTS5 index.
+
+Migration 0005 creates `catalog_product_fts`, an external-content FTS5 table
+over `catalog_product(title, description)` that SQLite triggers keep in step
+with every insert, update and delete (including bulk and raw SQL writes).
+When the table is missing (FTS5 not compiled in, or a non-SQLite database),
+searches fall back to DRF's `SearchFilter` (`LIKE '%term%'`).
+"""
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from rest_framework import filters
+
+FTS_TABLE = 'catalog_product_fts'
+
+# bm25() column weights for (title, description): title hits rank higher.
+BM25_WEIGHTS = (10.0, 1.0)
+
+# Databases (by NAME) where the FTS table has been seen. Only positive
+# results are cached so a later `migrate` in the same process is picked up.
+_fts_ready = set()
+
+
+def fts_available(connection):
+    """Return True when `connection` has the product FTS5 table."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = str(connection.settings_dict['NAME'])
+    if name in _fts_ready:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE],
+        )
+        found = cursor.fetchone() is not None
+    if found:
+        _fts_ready.add(name)
+    return found
+
+
+@contextmanager
+def fts_sync_deferred(connection):
+    """
+    Suspend the FTS sync triggers for a bulk load and rebuild the index once
+    at the end. Indexing row by row through the triggers dominates the cost
+    of inserting or deleting hundreds of thousands of products; one
+    `rebuild` is an order of magnitude cheaper. Runs in a transaction, so
+    the triggers come back even if the load fails.
+    """
+    if not fts_available(connection):
+        yield
+        return
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = 'catalog_product' AND name LIKE %s",
+                [f'{FTS_TABLE}%'],
+            )
+            triggers = cursor.fetchall()
+            for name, _ in triggers:
+                cursor.execute(f'DROP TRIGGER {connection.ops.quote_name(name)}')
+        yield
+        with connection.cursor() as cursor:
+            for _, sql in triggers:
+                cursor.execute(sql)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+
+
+def build_match_query(terms):
+    """
+    Turn DRF search terms into an FTS5 MATCH expression: each term becomes a
+    quoted prefix query (`"term"*`) so results update as the user types, and
+    terms are ANDed together like `SearchFilter` does.
+    """
+    parts = []
+    for term in terms:
+        term = term.replace('"', '').strip()
+        if term:
+            parts.append(f'"{term}"*')
+    return ' '.join(parts)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """`?search=` backed by the FTS5 index, annotating `search_rank`."""
+
+    def filter_queryset(self, request, queryset, view):
+        match = build_match_query(self.get_search_terms(request))
+        if not match or not fts_available(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        return queryset.extra(
+            select={'search_rank': f'bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {table}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+        )
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """Order full-text results by relevance unless `?ordering=` is given."""
+
+    def get_ordering(self, request, queryset, view):
+        searched = 'search_rank' in queryset.query.extra_select
+        if searched and not request.query_params.get(self.ordering_param):
+            # bm25() scores are negative; the best match sorts first.
+            return ['search_rank', *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
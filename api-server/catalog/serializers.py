@@ -1,21 +1,62 @@
+
 from rest_framework import serializers
+from showcase_api.timing import TimedListSerializer, TimedSerializerMixin
+
+from .cache import CachedListSerializer, CachedRepresentationMixin
+from .categories import category_map
+from .fields import parse_priority
 from .models import Category, Product
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name', 'description', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    category_name = serializers.CharField(
-        source='category.name', read_only=True
+class CategoryNameField(serializers.CharField):
+    """The product's category name, read from the process-local category
+    map (see catalog/categories.py) rather than a join or a query."""
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='category_id', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return category_map.name(value)
+
+
+class PriorityChoiceField(serializers.ChoiceField):
+    """A priority choice given as a number, a numeric string or a label in
+    any case ('high'); parsed like `PriorityField` does."""
+
+    def to_internal_value(self, data):
+        try:
+            return parse_priority(data, self.choices.items())
+        except ValueError:
+            self.fail('invalid_choice', input=data)
+
+
+class EmbedsCategoryNameMixin:
+    """Cache keys for payloads with `category_name` also carry the category
+    map version, so renaming a category invalidates them."""
+
+    def cache_key(self, row):
+        return f'{super().cache_key(row)}:{category_map.version().isoformat()}'
+
+
+class ProductSerializer(TimedSerializerMixin, EmbedsCategoryNameMixin,
+                        CachedRepresentationMixin, serializers.ModelSerializer):
+    category_name = CategoryNameField()
+    priority = PriorityChoiceField(
+        choices=Product.PRIORITY_CHOICES, required=False,
     )
     
     class Meta:
         model = Product
+        list_serializer_class = CachedListSerializer
         fields = [
             'id', 'title', 'description', 'category', 'category_name',
             'price', 'priority', 'is_featured', 'image_url', 'quantity',
@@ -39,85 +80,40 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Quantity must be >= 0.')
         return value
 
-    def validate_priority(self, value):
-        """
-        Accept numeric or string priority values. Map common labels to their
-        numeric choice equivalents so clients can send 'high' / 'High' etc.
-        """
-        # If it's already an integer, ensure it's one of the valid choices
-        if value is None:
-            return 2
-        # Allow numeric strings
-        if isinstance(value, str):
-            s = value.strip()
-            # numeric string
-            if s.isdigit():
-                return int(s)
-            s_low = s.lower()
-            if 'low' in s_low:
-                return 1
-            if 'medium' in s_low:
-                return 2
-            if 'high' in s_low:
-                return 3
-            if 'critical' in s_low:
-                return 4
-            raise serializers.ValidationError('Invalid priority value.')
 
-        try:
-            return int(value)
-        except (TypeError, ValueError):
-            raise serializers.ValidationError(
-                'Priority must be a number or known label.'
-            )
-
-    def update(self, instance, validated_data):
-        """Apply validated_data and save; if a ValueError occurs because the
-        underlying DB stored a non-numeric priority string (SQLite is
-        permissive), coerce that string to the numeric choice and retry.
-        """
-        # Apply incoming changes to the instance
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        try:
-            instance.save()
-            return instance
-        except ValueError as exc:
-            # Handle the specific Django ValueError raised when an integer
-            # field is given a non-numeric string (e.g. 'high'). Try to
-            # coerce the instance.priority to an integer choice and retry.
-            msg = str(exc)
-            if "Field 'priority' expected a number" in msg:
-                try:
-                    if isinstance(instance.priority, str):
-                        instance.priority = self.validate_priority(
-                            instance.priority
-                        )
-                except serializers.ValidationError:
-                    instance.priority = Product.priority.field.default
-
-                # Retry save after coercion
-                instance.save()
-                return instance
-            # Re-raise if it's an unexpected ValueError
-            raise
-
-
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(TimedSerializerMixin, EmbedsCategoryNameMixin,
+                            CachedRepresentationMixin,
+                            serializers.ModelSerializer):
     """Simplified serializer for list views"""
-    category_name = serializers.CharField(
-        source='category.name', read_only=True
-    )
+    category_name = CategoryNameField()
     
     class Meta:
         model = Product
+        list_serializer_class = CachedListSerializer
         fields = (
             'id', 'title', 'category', 'category_name',
             'price', 'priority', 'is_featured', 'image_url', 'quantity',
         )
 
 
+class ProductImportSerializer(ProductSerializer):
+    """Validates one bulk-import row without touching the database.
+
+    `id` selects the product to update (rows without one are created) and
+    `category` may be a category id or name; the importer resolves both for
+    a whole chunk of rows at once.
+    """
+    id = serializers.IntegerField(required=False)
+    category = serializers.CharField()
+
+    class Meta(ProductSerializer.Meta):
+        fields = [
+            'id', 'title', 'description', 'category', 'price', 'priority',
+            'is_featured', 'image_url', 'quantity',
+        ]
+        read_only_fields = []
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
@@ -131,20 +127,52 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_id', 'quantity', 'created_at']
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.SerializerMethodField()
+    # Stored on the cart and kept current as its items and their prices
+    # change (see Cart); rendered as an exact money string.
+    total = serializers.DecimalField(
+        source='subtotal', max_digits=14, decimal_places=2, read_only=True,
+    )
+    item_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         # placeholder model; views will set the real Cart model
         model = Product
-        fields = ['id', 'items', 'total', 'created_at', 'updated_at']
+        list_serializer_class = TimedListSerializer
+        fields = [
+            'id', 'items', 'total', 'item_count', 'created_at', 'updated_at',
+        ]
 
-    def get_total(self, obj):
-        # compute total from current product prices
-        total = 0
-        for item in getattr(obj, 'items').all():
-            price = float(item.product.price)
-            total += price * item.quantity
-        return f"{total:.2f}"
 
+class CartOperationSerializer(serializers.Serializer):
+    """One operation of a batch cart mutation (see CartViewSet.items_batch).
+    Mirrors the single-item actions: `add` increments a product's line,
+    `update` sets a line's quantity, `remove` deletes a line."""
+    OPERATIONS = ('add', 'update', 'remove')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField(required=False)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        op = attrs['op']
+        required = {
+            'add': ['product_id'],
+            'update': ['item_id', 'quantity'],
+            'remove': ['item_id'],
+        }[op]
+        missing = {
+            name: 'This field is required.'
+            for name in required if name not in attrs
+        }
+        if missing:
+            raise serializers.ValidationError(missing)
+        if op == 'add':
+            attrs.setdefault('quantity', 1)
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False)
@@ -0,0 +1,64 @@
+"""
+Model signal receivers for the catalog app, connected in `CatalogConfig.ready()`.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import changes
+from .categories import bump_version
+from .models import Cart, Category, Product
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    # Now, so the rest of this transaction reads the change, and again on
+    # commit: a thread that reloaded in between read the old rows.
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+@receiver(post_save, sender=Product)
+def product_price_changed(sender, instance, created, update_fields, **kwargs):
+    # Cart totals price every line at the product's current price.
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    price = sender._meta.get_field('price').to_python(instance.price)
+    # None when the instance was not loaded with its price: assume a change.
+    previous = getattr(instance, '_saved_price', None)
+    instance._saved_price = price
+    if not created and price != previous:
+        Cart.objects.filter(items__product=instance).recompute_totals()
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    # The product's cart lines are deleted with it, without going through
+    # CartItem.delete(); remember their carts to recompute afterwards.
+    carts = Cart.objects.filter(items__product=instance)
+    instance._cart_ids = list(carts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def product_removed_from_carts(sender, instance, **kwargs):
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        Cart.objects.filter(pk__in=cart_ids).recompute_totals()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+def record_saved(sender, instance, created, **kwargs):
+    changes.record(sender, [instance.pk])
+    if sender is Category and not created:
+        # Product payloads embed the category's name.
+        changes.record_queryset(Product.objects.filter(category=instance))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+def record_deleted(sender, instance, **kwargs):
+    # Deleting a category cascades to its products, each with its own
+    # post_delete, so they get tombstones too.
+    changes.record(sender, [instance.pk], deleted=True)
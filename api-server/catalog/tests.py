@@ -1,9 +1,44 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.http import StreamingHttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from showcase_api import routers
 
 from .models import Category, Product
-from .models import Cart
+from .cache import serializer_cache
+from . import changes, featured
+from .categories import CHECK_INTERVAL, category_map
+from .importers import import_products
+from .models import Cart, CartItem, CatalogChange
+from .search import fts_available
+from .renderers import FastJSONRenderer
+from .representations import ValuesRepresentation
+from .serializers import ProductListSerializer, ProductSerializer
+from .views import ProductViewSet
 
 
 class CatalogApiTests(APITestCase):
@@ -171,3 +206,1733 @@ class CatalogApiTests(APITestCase):
         # Ensure error messages include price or quantity validation
         data = created.data
         self.assertTrue('price' in data or 'quantity' in data)
+
+
+class QueryBudgetTests(APITestCase):
+    """Every catalog endpoint must run a constant number of SQL queries.
+
+    Each endpoint is exercised against a small and a larger data set; the
+    query count must not grow with the number of rows and must stay within
+    the budget below. Lower a budget when an endpoint gets cheaper. Raise
+    one only deliberately, for a query the endpoint now needs, and say why
+    in the commit (and in a comment here when it is not obvious).
+    """
+
+    QUERY_BUDGETS = {
+        'category-list': 0,
+        'product-list': 4,
+        'product-detail': 1,
+        'product-featured': 3,
+        'cart-list': 3,
+        'cart-detail': 2,
+        'cart-add-item': 6,
+        'cart-update-item': 5,
+        # Deleting a line also takes it out of the cart's stored totals.
+        'cart-remove-item': 6,
+        # Log, product rows (plus their cache misses) and categories.
+        'product-changes': 4,
+    }
+
+    def setUp(self):
+        self.cart = Cart.objects.create()
+
+    def populate(self, count):
+        categories = [
+            Category.objects.create(name=f"Budget cat {i}")
+            for i in range(count)
+        ]
+        products = []
+        for i in range(count):
+            products.append(Product.objects.create(
+                title=f"Budget prod {i}",
+                description="desc",
+                category=categories[i],
+                price=1 + i,
+                is_featured=True,
+                quantity=100,
+            ))
+            CartItem.objects.create(
+                cart=self.cart, product=products[-1], quantity=1
+            )
+        return products
+
+    def count_queries(self, method, url, data=None):
+        # Budgets are for the cold path: no cached representations. The
+        # category map is loaded once per process and the featured feed is
+        # maintained as products change, neither per request.
+        serializer_cache().clear()
+        category_map.current()
+        featured.rebuild()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(resp.status_code, 400, resp.data)
+        return len(ctx.captured_queries)
+
+    def endpoint_calls(self, product):
+        cart_pk = self.cart.pk
+        item = CartItem.objects.get(cart=self.cart, product=product)
+        return {
+            'category-list': ('get', reverse('category-list'), None),
+            'product-list': ('get', reverse('product-list'), None),
+            'product-detail': (
+                'get',
+                reverse('product-detail', kwargs={'pk': product.pk}),
+                None,
+            ),
+            'product-featured': ('get', reverse('product-featured'), None),
+            'product-changes': ('get', reverse('product-changes'), None),
+            'cart-list': ('get', reverse('cart-list'), None),
+            'cart-detail': (
+                'get', reverse('cart-detail', kwargs={'pk': cart_pk}), None,
+            ),
+            'cart-add-item': (
+                'post',
+                reverse('cart-add-item', kwargs={'pk': cart_pk}),
+                {'product_id': product.pk, 'quantity': 1},
+            ),
+            'cart-update-item': (
+                'patch',
+                reverse('cart-update-item', kwargs={'pk': cart_pk}),
+                {'item_id': item.pk, 'quantity': 2},
+            ),
+            'cart-remove-item': (
+                'delete',
+                reverse('cart-remove-item', kwargs={'pk': cart_pk}),
+                {'item_id': item.pk},
+            ),
+        }
+
+    def measure(self, count):
+        products = self.populate(count)
+        return {
+            name: self.count_queries(*call)
+            for name, call in self.endpoint_calls(products[0]).items()
+        }
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        small = self.measure(2)
+        large = self.measure(12)
+        for name, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(small[name], large[name])
+                self.assertLessEqual(large[name], budget)
+
+
+class CartTotalsTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Totals")
+        self.cart = Cart.objects.create()
+
+    def test_total_is_exact_decimal_string(self):
+        # 3 x 0.10 + 7 x 0.20 is 1.70 exactly; a float sum would not be.
+        for price, quantity in (('0.10', 3), ('0.20', 7)):
+            product = Product.objects.create(
+                title=price, description="d", category=self.category,
+                price=price, quantity=10,
+            )
+            CartItem.objects.create(
+                cart=self.cart, product=product, quantity=quantity
+            )
+        url = reverse('cart-detail', kwargs={'pk': self.cart.pk})
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['total'], '1.70')
+        self.assertEqual(resp.data['item_count'], 10)
+
+    def test_empty_cart_total(self):
+        url = reverse('cart-detail', kwargs={'pk': self.cart.pk})
+        resp = self.client.get(url)
+        self.assertEqual(resp.data['total'], '0.00')
+        self.assertEqual(resp.data['item_count'], 0)
+
+    def test_cart_read_query_count_is_flat_for_large_carts(self):
+        for i in range(200):
+            product = Product.objects.create(
+                title=f"p{i}", description="d", category=self.category,
+                price='1.25', quantity=5,
+            )
+            CartItem.objects.create(cart=self.cart, product=product)
+        url = reverse('cart-detail', kwargs={'pk': self.cart.pk})
+        category_map.current()  # loaded once per process, not per request
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+        self.assertEqual(resp.data['total'], '250.00')
+
+
+class StoredCartTotalsTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Stored")
+        self.cart = Cart.objects.create()
+        self.pen, self.ink, self.pad = [
+            Product.objects.create(
+                title=title, description="d", category=self.category,
+                price=price, quantity=20,
+            )
+            for title, price in (("Pen", "1.10"), ("Ink", "3.30"),
+                                 ("Pad", "0.25"))
+        ]
+
+    def assertTotals(self, subtotal, item_count):
+        cart = Cart.objects.with_computed_totals().get(pk=self.cart.pk)
+        self.assertEqual(
+            (cart.computed_subtotal, cart.computed_item_count),
+            (Decimal(subtotal), item_count),
+        )
+        self.assertEqual(
+            (cart.subtotal, cart.item_count), (Decimal(subtotal), item_count)
+        )
+
+    def url(self, name):
+        return reverse(name, kwargs={"pk": self.cart.pk})
+
+    def test_mutations_keep_totals_in_step(self):
+        resp = self.client.post(
+            self.url("cart-add-item"),
+            {"product_id": self.pen.pk, "quantity": 3}, format="json",
+        )
+        self.assertEqual((resp.data["total"], resp.data["item_count"]),
+                         ("3.30", 3))
+        self.client.post(
+            self.url("cart-add-item"),
+            {"product_id": self.pen.pk, "quantity": 1}, format="json",
+        )
+        self.assertTotals("4.40", 4)
+
+        item = CartItem.objects.get(cart=self.cart, product=self.pen)
+        self.client.patch(
+            self.url("cart-update-item"),
+            {"item_id": item.pk, "quantity": 2}, format="json",
+        )
+        self.assertTotals("2.20", 2)
+
+        resp = self.client.post(self.url("cart-items-batch"), {"operations": [
+            {"op": "add", "product_id": self.ink.pk, "quantity": 2},
+            {"op": "add", "product_id": self.pad.pk},
+            {"op": "update", "item_id": item.pk, "quantity": 5},
+        ]}, format="json")
+        self.assertEqual(resp.data["total"], "12.35")
+        self.assertTotals("12.35", 8)
+
+        resp = self.client.delete(
+            self.url("cart-remove-item"), {"item_id": item.pk}, format="json",
+        )
+        self.assertEqual(resp.data["total"], "6.85")
+        self.assertTotals("6.85", 3)
+
+        self.client.post(self.url("cart-checkout"))
+        self.assertTotals("0.00", 0)
+
+    def test_reads_use_the_stored_totals(self):
+        CartItem.objects.create(cart=self.cart, product=self.ink, quantity=2)
+        # Written behind the model's back, so only the stored value moves.
+        Cart.objects.filter(pk=self.cart.pk).update(subtotal="1.00")
+        resp = self.client.get(self.url("cart-detail"))
+        self.assertEqual(resp.data["total"], "1.00")
+
+    def test_price_changes_and_deletes_recompute_carts(self):
+        CartItem.objects.create(cart=self.cart, product=self.pen, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.ink, quantity=1)
+        self.pen.price = Decimal("2.00")
+        self.pen.save()
+        self.assertTotals("7.30", 3)
+        self.ink.delete()
+        self.assertTotals("4.00", 2)
+
+        import_products(
+            [json.dumps({"id": self.pen.pk, "price": "5.00"})], "ndjson"
+        )
+        self.assertTotals("10.00", 2)
+
+    def test_saves_that_keep_the_price_leave_carts_alone(self):
+        CartItem.objects.create(cart=self.cart, product=self.pen, quantity=2)
+        url = reverse("product-detail", kwargs={"pk": self.pen.pk})
+        for data in ({"title": "Gel pen"}, {"price": "1.1"}):
+            with self.subTest(data=data):
+                with CaptureQueriesContext(connection) as ctx:
+                    resp = self.client.patch(url, data, format="json")
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                self.assertFalse([
+                    q for q in ctx.captured_queries
+                    if q["sql"].startswith('UPDATE "catalog_cart"')
+                ])
+        self.client.patch(url, {"price": "1.50"}, format="json")
+        self.assertTotals("3.00", 2)
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        CartItem.objects.create(cart=self.cart, product=self.pen, quantity=2)
+        healthy = Cart.objects.create()
+        Cart.objects.filter(pk=self.cart.pk).update(
+            subtotal="9.99", item_count=7,
+        )
+        out = io.StringIO()
+        call_command("reconcile_carts", stdout=out)
+        self.assertIn(
+            f"cart {self.cart.pk}: stored 9.99 for 7 items", out.getvalue()
+        )
+        self.assertNotIn(f"cart {healthy.pk}:", out.getvalue())
+        self.assertIn("1 drifted", out.getvalue())
+        self.assertEqual(
+            Cart.objects.get(pk=self.cart.pk).subtotal, Decimal("9.99")
+        )
+
+        call_command("reconcile_carts", "--fix", stdout=io.StringIO())
+        self.assertTotals("2.20", 2)
+        out = io.StringIO()
+        call_command("reconcile_carts", stdout=out)
+        self.assertIn("none drifted", out.getvalue())
+
+
+class PurgeCartsTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Purge")
+        self.product = Product.objects.create(
+            title="Mug", description="d", category=category, price=4,
+            quantity=10,
+        )
+        self.old = [self.cart_with_item() for _ in range(5)]
+        self.recent = self.cart_with_item()
+        Cart.objects.filter(pk__in=[c.pk for c in self.old]).update(
+            updated_at=timezone.now() - timedelta(days=45)
+        )
+
+    def cart_with_item(self):
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        return cart
+
+    def purge(self, *args):
+        out = io.StringIO()
+        call_command("purge_carts", *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_stale_carts_in_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            output = self.purge("--days", "30", "--batch-size", "2")
+        self.assertIn("Deleted 5 carts and 5 cart items in 3 batches", output)
+        self.assertEqual(
+            list(Cart.objects.values_list("pk", flat=True)), [self.recent.pk]
+        )
+        self.assertEqual(CartItem.objects.count(), 1)
+        cart_deletes = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('DELETE FROM "catalog_cart"')
+        ]
+        self.assertEqual(len(cart_deletes), 3)
+
+    def test_dry_run_and_ttl(self):
+        output = self.purge("--days", "30", "--dry-run")
+        self.assertIn("Would delete 5 carts and 5 cart items", output)
+        self.assertEqual(Cart.objects.count(), 6)
+        self.assertIn("Deleted 0 carts", self.purge("--days", "60"))
+        self.assertEqual(Cart.objects.count(), 6)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Search")
+        self.title_hit = Product.objects.create(
+            title="Wireless keyboard", description="Compact layout",
+            category=self.category, price=30,
+        )
+        self.description_hit = Product.objects.create(
+            title="Desk mat", description="Fits any keyboard and mouse",
+            category=self.category, price=15,
+        )
+        Product.objects.create(
+            title="Monitor", description="27 inch", category=self.category,
+            price=200,
+        )
+
+    def search(self, term, **params):
+        resp = self.client.get(
+            reverse("product-list"), {"search": term, **params}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [p["id"] for p in resp.data["results"]]
+
+    def test_fts_index_is_available(self):
+        self.assertTrue(fts_available(connection))
+
+    def test_results_are_ranked_by_relevance(self):
+        self.assertEqual(
+            self.search("keyboard"),
+            [self.title_hit.id, self.description_hit.id],
+        )
+
+    def test_prefix_matching_and_explicit_ordering(self):
+        self.assertEqual(
+            self.search("keyb", ordering="price"),
+            [self.description_hit.id, self.title_hit.id],
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        self.title_hit.title = "Wireless trackpad"
+        self.title_hit.description = "Glass surface"
+        self.title_hit.save()
+        self.description_hit.delete()
+        self.assertEqual(self.search("keyboard"), [])
+        self.assertEqual(self.search("trackpad"), [self.title_hit.id])
+
+    def test_falls_back_to_like_search_without_fts(self):
+        with mock.patch("catalog.search.fts_available", return_value=False):
+            ids = self.search("eyboar")
+        self.assertCountEqual(
+            ids, [self.title_hit.id, self.description_hit.id]
+        )
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Keyset")
+        # Repeated prices exercise the id tie-breaker.
+        self.products = [
+            Product.objects.create(
+                title=f"Item {i}", description="d", category=category,
+                price=i % 3, priority=1 + i % 4,
+            )
+            for i in range(25)
+        ]
+
+    def walk(self, params):
+        url = reverse("product-list")
+        pages = []
+        resp = self.client.get(url, {"pagination": "cursor", **params})
+        while True:
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", resp.data)
+            pages.append(resp.data)
+            if not resp.data["next"]:
+                return pages
+            resp = self.client.get(resp.data["next"])
+
+    def test_walks_all_rows_in_order_for_each_ordering(self):
+        for ordering in ("-created_at", "price", "-price", "priority"):
+            with self.subTest(ordering=ordering):
+                pages = self.walk({"ordering": ordering})
+                ids = [p["id"] for page in pages for p in page["results"]]
+                field = ordering.lstrip("-")
+                expected = sorted(
+                    self.products,
+                    key=lambda p: (getattr(p, field), p.pk),
+                    reverse=ordering.startswith("-"),
+                )
+                self.assertEqual(ids, [p.pk for p in expected])
+                self.assertEqual(len(pages), 3)
+                self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_the_prior_page(self):
+        first, second, _ = self.walk({"ordering": "price"})
+        resp = self.client.get(second["previous"])
+        self.assertEqual(resp.data["results"], first["results"])
+        self.assertIsNotNone(resp.data["next"])
+
+    def test_deep_page_does_not_count_or_offset(self):
+        pages = self.walk({})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(pages[-2]["next"])
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("COUNT(", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_category_list_supports_cursor_mode(self):
+        resp = self.client.get(
+            reverse("category-list"), {"pagination": "cursor"}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn("next", resp.data)
+        self.assertEqual(len(resp.data["results"]), 1)
+
+    def test_invalid_cursor_is_not_found(self):
+        resp = self.client.get(reverse("product-list"), {"cursor": "bogus"})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Conditional")
+        self.product = Product.objects.create(
+            title="Lamp", description="d", category=self.category,
+            price=12, is_featured=True,
+        )
+
+    def revalidate(self, url, **headers):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", first)
+        return first, self.client.get(
+            url, HTTP_IF_NONE_MATCH=first["ETag"], **headers
+        )
+
+    def test_unchanged_resources_return_304(self):
+        urls = [
+            reverse("product-list"),
+            reverse("product-list") + "?priority=2",
+            reverse("product-detail", kwargs={"pk": self.product.pk}),
+            reverse("product-featured"),
+            reverse("category-list"),
+            reverse("category-detail", kwargs={"pk": self.category.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first, second = self.revalidate(url)
+                self.assertEqual(
+                    second.status_code, status.HTTP_304_NOT_MODIFIED
+                )
+                self.assertEqual(second["ETag"], first["ETag"])
+                self.assertEqual(second.content, b"")
+
+    def test_not_modified_skips_serialization(self):
+        url = reverse("product-list")
+        first = self.client.get(url)
+        with mock.patch.object(
+            ProductSerializer, "to_representation"
+        ) as to_representation:
+            with self.assertNumQueries(1):
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+
+    def test_if_modified_since(self):
+        url = reverse("product-detail", kwargs={"pk": self.product.pk})
+        first = self.client.get(url)
+        resp = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+        )
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_product_and_category_changes_invalidate(self):
+        list_url = reverse("product-list")
+        etag = self.client.get(list_url)["ETag"]
+        self.product.price = 13
+        self.product.save()
+        resp = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        etag = resp["ETag"]
+        self.category.name = "Renamed"
+        self.category.save()
+        resp = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["results"][0]["category_name"], "Renamed")
+
+    def test_deleting_a_row_invalidates_the_list(self):
+        url = reverse("product-featured")
+        etag = self.client.get(url)["ETag"]
+        self.product.delete()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_lists_carry_no_last_modified(self):
+        older = Product.objects.create(
+            title="Desk", description="d", category=self.category, price=30,
+        )
+        Product.objects.filter(pk=older.pk).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        urls = [
+            reverse("product-list"),
+            reverse("product-featured"),
+            reverse("product-facets"),
+            reverse("category-list"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotIn("Last-Modified", self.client.get(url))
+        # The newest row survives the delete, so MAX(updated_at) would not
+        # move and a Last-Modified check would wrongly answer 304.
+        since = http_date(time.time() + 60)
+        older.delete()
+        resp = self.client.get(
+            reverse("product-list"), HTTP_IF_MODIFIED_SINCE=since
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["count"], 1)
+
+
+class SerializerCacheTests(APITestCase):
+    def setUp(self):
+        serializer_cache().clear()
+        self.category = Category.objects.create(name="Cached")
+        self.products = [
+            Product.objects.create(
+                title=f"Cached {i}", description="d", category=self.category,
+                price=i,
+            )
+            for i in range(3)
+        ]
+
+    def test_warm_list_skips_serialization_and_full_rows(self):
+        url = reverse("product-list")
+        cold = self.client.get(url)
+        with mock.patch.object(
+            ProductSerializer, "build_representation"
+        ) as build:
+            with self.assertNumQueries(3):
+                warm = self.client.get(url)
+        build.assert_not_called()
+        self.assertEqual(warm.data, cold.data)
+
+    def test_only_missing_rows_are_loaded_and_serialized(self):
+        url = reverse("product-list")
+        self.client.get(url)
+        self.products[0].title = "Changed"
+        self.products[0].save()
+        with mock.patch.object(
+            ValuesRepresentation, "build",
+            autospec=True, side_effect=ValuesRepresentation.build,
+        ) as build:
+            resp = self.client.get(url)
+        self.assertEqual(build.call_count, 1)
+        titles = {p["id"]: p["title"] for p in resp.data["results"]}
+        self.assertEqual(titles[self.products[0].pk], "Changed")
+
+    def test_rows_deleted_after_the_page_query_are_dropped(self):
+        rows = list(
+            Product.objects.order_by("pk")
+            .values(*ProductViewSet.list_row_fields)
+        )
+        gone = self.products[1].pk
+        Product.objects.filter(pk=gone).delete()
+        data = ProductSerializer(rows, many=True).data
+        self.assertEqual(
+            [p["id"] for p in data],
+            [self.products[0].pk, self.products[2].pk],
+        )
+
+    def test_category_save_invalidates_embedded_name(self):
+        url = reverse("product-detail", kwargs={"pk": self.products[0].pk})
+        self.assertEqual(self.client.get(url).data["category_name"], "Cached")
+        self.category.name = "Renamed"
+        self.category.save()
+        self.assertEqual(
+            self.client.get(url).data["category_name"], "Renamed"
+        )
+
+    def test_cart_items_use_cached_product_representations(self):
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=self.products[1])
+        url = reverse("cart-detail", kwargs={"pk": cart.pk})
+        first = self.client.get(url)
+        with mock.patch.object(
+            ProductListSerializer, "build_representation"
+        ) as build:
+            second = self.client.get(url)
+        build.assert_not_called()
+        self.assertEqual(second.data["items"], first.data["items"])
+
+
+class FastReadPathTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Caf\u00e9 \u2028 line")
+        self.products = [
+            Product.objects.create(
+                title="\u00dcber widget", description="Line\u2029break",
+                category=category, price="1234.50", priority=4,
+                is_featured=True, image_url="https://example.com/a.png",
+                quantity=7,
+            ),
+            Product.objects.create(
+                title="Plain", description="", category=category,
+                price="0.05",
+            ),
+        ]
+
+    def test_values_rows_match_model_serializers(self):
+        queryset = Product.objects.select_related("category")
+        for serializer_class in (ProductSerializer, ProductListSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                fast = ValuesRepresentation(serializer_class).for_pks(
+                    Product.objects, [p.pk for p in self.products]
+                )
+                for product in queryset:
+                    expected = serializer_class(product).build_representation(
+                        product
+                    )
+                    self.assertEqual(fast[product.pk], dict(expected))
+                    self.assertEqual(
+                        list(fast[product.pk]), list(expected)
+                    )
+
+    def test_fast_renderer_matches_json_renderer(self):
+        with self.settings(CATALOG_SERIALIZER_CACHE=None):
+            data = self.client.get(reverse("product-list")).data
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_list_response_is_unchanged_by_fast_path(self):
+        resp = self.client.get(reverse("product-list"))
+        products = Product.objects.select_related("category").order_by(
+            "-created_at"
+        )
+        expected = [
+            dict(ProductSerializer().build_representation(product))
+            for product in products
+        ]
+        self.assertEqual(
+            [dict(item) for item in resp.data["results"]], expected
+        )
+
+
+class CategoryMapTests(APITestCase):
+    def setUp(self):
+        serializer_cache().clear()
+        self.category = Category.objects.create(name="Mapped")
+        self.product = Product.objects.create(
+            title="Mapped product", description="d", category=self.category,
+            price=1,
+        )
+        category_map.current()
+
+    def test_product_reads_never_touch_the_category_table(self):
+        urls = [
+            reverse("product-list"),
+            reverse("product-list") + "?search=mapped",
+            reverse("product-detail", kwargs={"pk": self.product.pk}),
+            reverse("product-featured"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as ctx:
+                    resp = self.client.get(url)
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                for query in ctx.captured_queries:
+                    self.assertNotIn("catalog_category", query["sql"])
+        resp = self.client.get(
+            reverse("product-detail", kwargs={"pk": self.product.pk})
+        )
+        self.assertEqual(resp.data["category_name"], "Mapped")
+
+    def test_category_reads_come_from_the_map(self):
+        with self.assertNumQueries(0):
+            listed = self.client.get(reverse("category-list"))
+            detail = self.client.get(
+                reverse("category-detail", kwargs={"pk": self.category.pk})
+            )
+        self.assertEqual(listed.data["results"][0]["name"], "Mapped")
+        self.assertEqual(detail.data["name"], "Mapped")
+        missing = self.client.get(
+            reverse("category-detail", kwargs={"pk": self.category.pk + 1})
+        )
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_refreshes_the_map(self):
+        other = Category.objects.create(name="Other")
+        self.assertEqual(category_map.name(other.pk), "Other")
+        other.delete()
+        self.assertIsNone(category_map.get(other.pk))
+        resp = self.client.get(reverse("category-list"))
+        self.assertEqual([c["name"] for c in resp.data["results"]], ["Mapped"])
+
+    def test_unknown_ids_reload_the_map(self):
+        # Written behind the map's back, as another process would.
+        Category.objects.bulk_create([Category(name="Elsewhere")])
+        created = Category.objects.get(name="Elsewhere")
+        self.assertEqual(category_map.name(created.pk), "Elsewhere")
+
+    def test_writes_from_other_processes_reach_the_map(self):
+        # As another process would: the rows and the log, but no signal
+        # reaching this process's map.
+        Category.objects.filter(pk=self.category.pk).update(
+            name="Renamed", updated_at=timezone.now()
+        )
+        changes.record(Category, [self.category.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(category_map.name(self.category.pk), "Mapped")
+        category_map._checked_at -= CHECK_INTERVAL
+        with self.assertNumQueries(2):
+            self.assertEqual(category_map.name(self.category.pk), "Renamed")
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("category-list"))
+        self.assertEqual(resp.data["results"][0]["name"], "Renamed")
+
+
+class ProductFacetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.tools = Category.objects.create(name="Tools")
+        self.toys = Category.objects.create(name="Toys")
+        rows = [
+            ("Hammer", self.tools, "12.00", 3, True),
+            ("Wrench", self.tools, "30.00", 2, False),
+            ("Drill", self.tools, "120.00", 4, True),
+            ("Yo-yo", self.toys, "5.00", 1, False),
+        ]
+        self.products = [
+            Product.objects.create(
+                title=title, description="d", category=category,
+                price=price, priority=priority, is_featured=featured,
+            )
+            for title, category, price, priority, featured in rows
+        ]
+        self.url = reverse("product-facets")
+        category_map.current()
+
+    def counts(self, facet, data):
+        return {row["value"]: row["count"] for row in data[facet]}
+
+    def test_counts_every_facet(self):
+        data = self.client.get(self.url).data
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(
+            data["category"][0],
+            {"value": self.tools.pk, "label": "Tools", "count": 3},
+        )
+        self.assertEqual(
+            self.counts("priority", data), {1: 1, 2: 1, 3: 1, 4: 1}
+        )
+        self.assertEqual(
+            self.counts("is_featured", data), {True: 2, False: 2}
+        )
+        prices = {row["min"]: row["count"] for row in data["price"]}
+        self.assertEqual(prices["0.00"], 2)
+        self.assertEqual(prices["25.00"], 1)
+        self.assertEqual(prices["100.00"], 1)
+        self.assertEqual(data["price"][-1]["max"], None)
+
+    def test_applies_list_filters_and_search(self):
+        data = self.client.get(
+            self.url, {"category": self.tools.pk, "is_featured": "true"}
+        ).data
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(self.counts("category", data), {self.tools.pk: 2})
+        data = self.client.get(self.url, {"search": "wrench"}).data
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(self.counts("priority", data)[2], 1)
+
+    def test_fixed_queries_and_cached_per_signature(self):
+        with self.assertNumQueries(3):
+            cold = self.client.get(self.url, {"search": "drill"})
+        with CaptureQueriesContext(connection) as ctx:
+            warm = self.client.get(self.url, {"search": "drill"})
+        self.assertEqual(warm.data, cold.data)
+        # Only the change log's position, never a scan of the products.
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("catalog_product", ctx.captured_queries[0]["sql"])
+
+        self.products[2].is_featured = False
+        self.products[2].save()
+        data = self.client.get(self.url, {"search": "drill"}).data
+        self.assertEqual(self.counts("is_featured", data), {True: 0, False: 1})
+
+    def test_conditional_get(self):
+        first = self.client.get(self.url)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class FeaturedFeedTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Feed")
+        # Created oldest first: ids and creation times rise together.
+        self.products = [
+            Product.objects.create(
+                title=f"Featured {i}", description="d", category=self.category,
+                price=1, priority=priority, is_featured=True,
+            )
+            for i, priority in enumerate([2, 4, 2, 1, 3, 2, 4, 1, 2, 3, 2, 1])
+        ]
+        self.plain = Product.objects.create(
+            title="Plain", description="d", category=self.category, price=1,
+        )
+        self.url = reverse("product-featured")
+        featured.rebuild()
+        category_map.current()
+
+    def feed_ids(self):
+        _, keys = featured.current()
+        return [featured.product_id(key) for key in keys]
+
+    def expected_ids(self):
+        products = Product.objects.filter(is_featured=True)
+        return list(
+            products.order_by("-priority", "-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def test_ordered_by_priority_then_recency_and_paginated(self):
+        first = self.client.get(self.url).data
+        second = self.client.get(self.url, {"page": 2}).data
+        self.assertEqual(first["count"], 12)
+        self.assertIsNone(second["next"])
+        ids = [p["id"] for p in first["results"] + second["results"]]
+        self.assertEqual(ids, self.expected_ids())
+        self.assertEqual(ids[:2], [self.products[6].pk, self.products[1].pk])
+        self.assertNotIn(self.plain.pk, ids)
+
+    def test_saves_and_deletes_are_caught_up_from_the_log(self):
+        self.plain.is_featured = True
+        self.plain.priority = 4
+        self.plain.save()
+        self.products[1].priority = 1
+        self.products[1].save()
+        self.products[6].is_featured = False
+        self.products[6].save()
+        self.products[4].delete()
+        # Log position, changed ids and their rows; no rebuild.
+        with self.assertNumQueries(3):
+            ids = self.feed_ids()
+        self.assertEqual(ids, self.expected_ids())
+        self.assertEqual(ids[0], self.plain.pk)
+
+    def test_page_reads_run_a_fixed_number_of_queries(self):
+        serializer_cache().clear()
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {"page": 2})
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {"page": 2})
+
+    def test_changes_invalidate_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.products[0].title = "Renamed"
+        self.products[0].save()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_writes_without_signals_are_caught_up(self):
+        # Behind the feed's back, as raw SQL or another process would.
+        Product.objects.filter(pk=self.products[6].pk).update(
+            is_featured=False
+        )
+        ids = [p["id"] for p in self.client.get(self.url).data["results"]]
+        self.assertNotIn(self.products[6].pk, ids)
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+
+        import_products(
+            [json.dumps({"id": self.plain.pk, "is_featured": True})], "ndjson"
+        )
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+        self.assertIn(self.plain.pk, self.feed_ids())
+
+    def test_writes_from_other_processes_reach_every_page(self):
+        etag = self.client.get(self.url)["ETag"]
+        # Another worker's write: it never touches this process's copy of
+        # the feed, only the rows and the change log.
+        Product.objects.filter(pk=self.plain.pk).update(
+            is_featured=True, priority=4
+        )
+        changes.record(Product, [self.plain.pk])
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["results"][0]["id"], self.plain.pk)
+        self.assertEqual(resp.data["count"], 13)
+
+    def test_feed_rows_come_from_the_primary(self):
+        # No such alias: a replica read would raise.
+        Product.objects.filter(pk=self.plain.pk).update(is_featured=True)
+        changes.record(Product, [self.plain.pk])
+        expected = self.expected_ids()
+        _, token = routers.start_request(use_replicas=True)
+        try:
+            with override_settings(DATABASE_REPLICAS=["replica"]):
+                self.assertEqual(self.feed_ids(), expected)
+                featured.invalidate()
+                self.assertEqual(self.feed_ids(), expected)
+        finally:
+            routers.end_request(token)
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Checkout")
+        self.cart = Cart.objects.create()
+        self.pen = Product.objects.create(
+            title="Pen", description="d", category=category,
+            price="1.10", quantity=5,
+        )
+        self.ink = Product.objects.create(
+            title="Ink", description="d", category=category,
+            price="3.30", quantity=1,
+        )
+        self.url = reverse("cart-checkout", kwargs={"pk": self.cart.pk})
+
+    def test_checkout_decrements_stock_and_empties_cart(self):
+        CartItem.objects.create(cart=self.cart, product=self.pen, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=self.ink, quantity=1)
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["total"], "6.60")
+        self.assertEqual(len(resp.data["lines"]), 2)
+        self.pen.refresh_from_db()
+        self.ink.refresh_from_db()
+        self.assertEqual((self.pen.quantity, self.ink.quantity), (2, 0))
+        self.assertFalse(self.cart.items.exists())
+
+    def test_failed_lines_are_reported_and_nothing_is_reserved(self):
+        CartItem.objects.create(cart=self.cart, product=self.pen, quantity=2)
+        ink_line = CartItem.objects.create(
+            cart=self.cart, product=self.ink, quantity=4
+        )
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["failures"], [{
+            "item_id": ink_line.pk,
+            "product_id": self.ink.pk,
+            "requested": 4,
+            "available": 1,
+        }])
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.quantity, 5)
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_empty_cart_is_rejected(self):
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Lock waits are expected here; keep the slow-request log quiet.
+@override_settings(SLOW_REQUEST_THRESHOLD_MS=None)
+class CheckoutConcurrencyTests(TransactionTestCase):
+    BUYERS = 12
+    STOCK = 5
+
+    def test_concurrent_checkouts_never_oversell(self):
+        category = Category.objects.create(name="Hot")
+        product = Product.objects.create(
+            title="Limited", description="d", category=category,
+            price="9.99", quantity=self.STOCK,
+        )
+        carts = []
+        for _ in range(self.BUYERS):
+            cart = Cart.objects.create()
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            carts.append(cart)
+
+        start = threading.Barrier(self.BUYERS)
+        results = []
+
+        def buy(cart):
+            # The test client re-raises request exceptions through a signal
+            # shared by every thread, so failures are read as 500s instead.
+            client = APIClient(raise_request_exception=False)
+            url = reverse("cart-checkout", kwargs={"pk": cart.pk})
+            start.wait()
+            try:
+                # SQLite allows one writer at a time; a writer that times
+                # out waiting is told to retry, and does, like a client.
+                for _ in range(200):
+                    resp = client.post(url)
+                    if (
+                        resp.status_code
+                        != status.HTTP_503_SERVICE_UNAVAILABLE
+                        or not resp.has_header("Retry-After")
+                    ):
+                        results.append(resp.status_code)
+                        return
+                    time.sleep(0.005)
+                results.append(None)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=buy, args=(cart,)) for cart in carts
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertNotIn(status.HTTP_500_INTERNAL_SERVER_ERROR, results)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(results.count(status.HTTP_200_OK), self.STOCK)
+        self.assertEqual(
+            results.count(status.HTTP_409_CONFLICT),
+            self.BUYERS - self.STOCK,
+        )
+
+    def test_lock_timeouts_ask_the_client_to_retry(self):
+        cart = Cart.objects.create()
+        url = reverse("cart-checkout", kwargs={"pk": cart.pk})
+        with mock.patch(
+            "catalog.views.checkout_cart",
+            side_effect=OperationalError("database is locked"),
+        ):
+            resp = APIClient().post(url)
+        self.assertEqual(
+            resp.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(resp["Retry-After"], "1")
+
+    def test_other_database_errors_are_not_retried(self):
+        cart = Cart.objects.create()
+        url = reverse("cart-checkout", kwargs={"pk": cart.pk})
+        with mock.patch(
+            "catalog.views.checkout_cart",
+            side_effect=OperationalError("no such table: catalog_product"),
+        ):
+            with self.assertRaises(OperationalError):
+                APIClient().post(url)
+
+
+class CartBatchTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Batch")
+        self.cart = Cart.objects.create()
+        self.products = [
+            Product.objects.create(
+                title=f"B{i}", description="d", category=category,
+                price="2.00", quantity=5,
+            )
+            for i in range(4)
+        ]
+        self.kept = CartItem.objects.create(
+            cart=self.cart, product=self.products[0], quantity=1
+        )
+        self.dropped = CartItem.objects.create(
+            cart=self.cart, product=self.products[1], quantity=1
+        )
+        self.url = reverse("cart-items-batch", kwargs={"pk": self.cart.pk})
+
+    def quantities(self):
+        return dict(self.cart.items.values_list("product_id", "quantity"))
+
+    def test_applies_all_operations_and_returns_cart_once(self):
+        operations = [
+            {"op": "add", "product_id": self.products[2].pk, "quantity": 2},
+            {"op": "add", "product_id": self.products[3].pk},
+            {"op": "add", "product_id": self.products[2].pk, "quantity": 1},
+            {"op": "update", "item_id": self.kept.pk, "quantity": 4},
+            {"op": "remove", "item_id": self.dropped.pk},
+        ]
+        resp = self.client.post(
+            self.url, {"operations": operations}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.quantities(), {
+            self.products[0].pk: 4,
+            self.products[2].pk: 3,
+            self.products[3].pk: 1,
+        })
+        self.assertEqual(resp.data["total"], "16.00")
+        self.assertEqual(len(resp.data["items"]), 3)
+
+    def test_query_count_does_not_grow_with_operations(self):
+        def run(products):
+            url = reverse(
+                "cart-items-batch", kwargs={"pk": Cart.objects.create().pk}
+            )
+            operations = [
+                {"op": "add", "product_id": p.pk, "quantity": 1}
+                for p in products
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.post(
+                    url, {"operations": operations}, format="json"
+                )
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            return len(ctx.captured_queries)
+
+        category_map.current()  # loaded once per process, not per request
+        self.assertEqual(run(self.products[:1]), run(self.products))
+
+    def test_any_failure_rejects_the_whole_batch(self):
+        operations = [
+            {"op": "add", "product_id": self.products[2].pk, "quantity": 1},
+            {"op": "add", "product_id": self.products[0].pk, "quantity": 5},
+            {"op": "update", "item_id": 999999, "quantity": 1},
+            {"op": "add", "product_id": 999999},
+        ]
+        before = self.quantities()
+        resp = self.client.post(
+            self.url, {"operations": operations}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = resp.data["operations"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("quantity", errors[1])
+        self.assertIn("item_id", errors[2])
+        self.assertIn("product_id", errors[3])
+        self.assertEqual(self.quantities(), before)
+
+    def test_operations_are_validated(self):
+        resp = self.client.post(
+            self.url,
+            {"operations": [{"op": "update", "item_id": self.kept.pk}]},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("quantity", resp.data["operations"][0])
+
+
+class ProductImportTests(APITestCase):
+    def setUp(self):
+        self.url = reverse("product-bulk-import")
+        self.category = Category.objects.create(name="Tools")
+        self.existing = Product.objects.create(
+            title="Hammer",
+            description="Claw hammer",
+            category=self.category,
+            price=Decimal("12.00"),
+            quantity=3,
+        )
+
+    def post(self, body, content_type, **params):
+        url = self.url
+        if params:
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+        return self.client.generic(
+            "POST", url, body.encode("utf-8"), content_type=content_type
+        )
+
+    def test_ndjson_creates_and_updates_reporting_bad_rows(self):
+        lines = [
+            {"title": "Saw", "description": "Hand saw",
+             "category": "Tools", "price": "20.00", "quantity": 5},
+            {"title": "Drill", "description": "Cordless",
+             "category": str(self.category.pk), "price": "80.00"},
+            {"id": self.existing.pk, "price": "14.50"},
+            {"title": "Bad", "description": "x", "category": "Tools",
+             "price": "-1"},
+            {"title": "Orphan", "description": "x", "category": "Nope",
+             "price": "1.00"},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\n{oops\n"
+        resp = self.post(body, "application/x-ndjson", batch_size=2)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["created"], 2)
+        self.assertEqual(resp.data["updated"], 1)
+        self.assertEqual(
+            [error["row"] for error in resp.data["errors"]], [4, 5, 6]
+        )
+        self.assertIn("price", resp.data["errors"][0]["errors"])
+        self.assertIn("category", resp.data["errors"][1]["errors"])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.price, Decimal("14.50"))
+        self.assertEqual(self.existing.title, "Hammer")
+        drill = Product.objects.get(title="Drill")
+        self.assertEqual(drill.category, self.category)
+        self.assertEqual(drill.quantity, 0)
+
+    def test_csv_import(self):
+        body = (
+            "title,description,category,price,priority,is_featured\n"
+            'Level,"Spirit level, 60cm",Tools,9.99,3,true\n'
+            "Tape,Measuring tape,Tools,4.00,,\n"
+        )
+        resp = self.post(body, "text/csv")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["created"], 2)
+        self.assertEqual(resp.data["errors"], [])
+        level = Product.objects.get(title="Level")
+        self.assertEqual(level.description, "Spirit level, 60cm")
+        self.assertEqual(level.priority, 3)
+        self.assertTrue(level.is_featured)
+        self.assertEqual(Product.objects.get(title="Tape").priority, 2)
+
+    def test_categories_resolve_from_the_category_map(self):
+        body = "\n".join(
+            json.dumps({"title": f"P{i}", "description": "d",
+                        "category": "Tools", "price": "1.00"})
+            for i in range(50)
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.post(body, "application/x-ndjson", batch_size=25)
+        self.assertEqual(resp.data["created"], 50)
+        category_queries = [
+            q for q in ctx.captured_queries
+            if 'FROM "catalog_category"' in q["sql"]
+        ]
+        # At most the map's own load, however many batches there are.
+        self.assertLessEqual(len(category_queries), 1)
+
+    def test_unsupported_content_type(self):
+        resp = self.client.post(self.url, {"title": "x"}, format="json")
+        self.assertEqual(
+            resp.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".csv", delete=False, encoding="utf-8"
+        ) as handle:
+            handle.write("title,description,category,price\n")
+            handle.write("Chisel,Wood chisel,Tools,7.00\n")
+        self.addCleanup(os.unlink, handle.name)
+        out = io.StringIO()
+        call_command("import_products", handle.name, stdout=out)
+        self.assertIn("Created 1", out.getvalue())
+        self.assertTrue(Product.objects.filter(title="Chisel").exists())
+
+
+class ProductExportTests(APITestCase):
+    def setUp(self):
+        self.url = reverse("product-export")
+        self.tools = Category.objects.create(name="Tools")
+        self.toys = Category.objects.create(name="Toys")
+        for i in range(5):
+            Product.objects.create(
+                title=f"Tool {i}",
+                description="Sturdy, reliable",
+                category=self.tools if i < 3 else self.toys,
+                price=Decimal(i) + Decimal("0.50"),
+                priority=1 + i % 4,
+            )
+
+    def content(self, resp):
+        self.assertIsInstance(resp, StreamingHttpResponse)
+        return b"".join(resp.streaming_content).decode("utf-8")
+
+    def test_ndjson_matches_product_payloads(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp["Content-Type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in self.content(resp).splitlines()]
+        self.assertEqual(len(lines), 5)
+        expected = ProductSerializer(
+            Product.objects.order_by("-created_at"), many=True
+        ).data
+        self.assertEqual(lines, json.loads(JSONRenderer().render(expected)))
+
+    def test_csv_honors_filters(self):
+        resp = self.client.get(
+            self.url, {"format": "csv", "category": self.tools.pk}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp["Content-Type"].startswith("text/csv"))
+        rows = list(csv.DictReader(io.StringIO(self.content(resp))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["description"], "Sturdy, reliable")
+        self.assertEqual({row["category_name"] for row in rows}, {"Tools"})
+
+    def test_streams_in_chunks_without_loading_the_queryset(self):
+        with self.settings(CATALOG_EXPORT_CHUNK_SIZE=2):
+            resp = self.client.get(self.url, {"ordering": "price"})
+            chunks = list(resp.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        first = json.loads(chunks[0].splitlines()[0])
+        self.assertEqual(first["price"], "0.50")
+
+
+class SeedDataTests(TransactionTestCase):
+    def seed(self, **options):
+        call_command("seed_data", stdout=io.StringIO(), **options)
+        return list(Product.objects.order_by("pk").values_list(
+            "title", "description", "category_id", "price", "priority",
+            "is_featured", "quantity", "created_at",
+        ))
+
+    def test_synthetic_data_is_deterministic(self):
+        first = self.seed(products=200, categories=7, carts=20, seed=3)
+        self.assertEqual(len(first), 200)
+        self.assertEqual(Category.objects.count(), 7)
+        self.assertEqual(Cart.objects.count(), 20)
+        items = list(CartItem.objects.values_list(
+            "cart_id", "product_id", "quantity"
+        ))
+        self.assertTrue(items)
+
+        self.assertEqual(
+            self.seed(products=200, categories=7, carts=20, seed=3), first
+        )
+        self.assertEqual(list(CartItem.objects.values_list(
+            "cart_id", "product_id", "quantity"
+        )), items)
+        out = io.StringIO()
+        call_command("reconcile_carts", stdout=out)
+        self.assertIn("Checked 20 carts, none drifted.", out.getvalue())
+        self.assertNotEqual(
+            self.seed(products=200, categories=7, carts=20, seed=4), first
+        )
+
+    def test_search_index_is_rebuilt(self):
+        if not fts_available(connection):
+            self.skipTest("SQLite FTS5 not available")
+        self.seed(products=50, categories=2, seed=1)
+        title = Product.objects.get(pk=10).title
+        resp = APIClient().get(
+            reverse("product-list"), {"search": title.split()[-1]}
+        )
+        self.assertIn(10, [row["id"] for row in resp.json()["results"]])
+
+    def test_fixture_replaces_existing_rows(self):
+        self.seed(products=30, categories=3, carts=5, seed=1)
+        self.seed()
+        self.assertEqual(Product.objects.count(), 15)
+        self.assertEqual(Category.objects.count(), 5)
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(
+            set(Product.objects.values_list("priority", flat=True))
+            - {1, 2, 3, 4},
+            set(),
+        )
+
+
+def concurrent_requests(calls):
+    """Issue `(method, url, data)` calls from one thread each, released
+    together; returns the responses in call order."""
+    start = threading.Barrier(len(calls))
+    responses = [None] * len(calls)
+
+    def send(index, method, url, data):
+        # The test client re-raises request exceptions through a signal
+        # shared by every thread, so failures are read as 500s instead.
+        client = APIClient(raise_request_exception=False)
+        start.wait()
+        try:
+            responses[index] = getattr(client, method)(
+                url, data, format="json"
+            )
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=send, args=(index, *call))
+        for index, call in enumerate(calls)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+# Lock waits are expected here; keep the slow-request log quiet.
+@override_settings(SLOW_REQUEST_THRESHOLD_MS=None)
+class CartItemConcurrencyTests(TransactionTestCase):
+    ADDS = 8
+
+    def test_concurrent_adds_keep_items_and_totals_in_step(self):
+        category = Category.objects.create(name="Busy")
+        product = Product.objects.create(
+            title="Popular", description="d", category=category,
+            price="2.50", quantity=100,
+        )
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        url = reverse("cart-add-item", kwargs={"pk": cart.pk})
+
+        responses = concurrent_requests(
+            [("post", url, {"product_id": product.pk})] * self.ADDS
+        )
+
+        self.assertEqual(
+            [r.status_code for r in responses], [200] * self.ADDS
+        )
+        item = CartItem.objects.get(cart=cart, product=product)
+        self.assertEqual(item.quantity, 1 + self.ADDS)
+        cart = Cart.objects.with_computed_totals().get(pk=cart.pk)
+        self.assertEqual(
+            (cart.subtotal, cart.item_count),
+            (cart.computed_subtotal, cart.computed_item_count),
+        )
+        self.assertEqual(cart.item_count, 1 + self.ADDS)
+
+
+# Lock waits are expected here; keep the slow-request log quiet.
+@override_settings(SLOW_REQUEST_THRESHOLD_MS=None)
+class CartBatchConcurrencyTests(TransactionTestCase):
+    BATCHES = 40
+
+    def test_concurrent_batches_apply_one_after_another(self):
+        category = Category.objects.create(name="Batched")
+        pen, ink = [
+            Product.objects.create(
+                title=title, description="d", category=category,
+                price=price, quantity=1000,
+            )
+            for title, price in (("Pen", "1.10"), ("Ink", "3.30"))
+        ]
+        cart = Cart.objects.create()
+        url = reverse("cart-items-batch", kwargs={"pk": cart.pk})
+        # Every batch adds to both lines; the first ones also create them.
+        operations = {"operations": [
+            {"op": "add", "product_id": pen.pk},
+            {"op": "add", "product_id": ink.pk, "quantity": 2},
+        ]}
+
+        responses = concurrent_requests(
+            [("post", url, operations)] * self.BATCHES
+        )
+
+        self.assertEqual(
+            [r.status_code for r in responses], [200] * self.BATCHES
+        )
+        quantities = dict(
+            cart.items.values_list("product_id", "quantity")
+        )
+        self.assertEqual(
+            quantities, {pen.pk: self.BATCHES, ink.pk: 2 * self.BATCHES}
+        )
+        cart = Cart.objects.with_computed_totals().get(pk=cart.pk)
+        self.assertEqual(
+            (cart.subtotal, cart.item_count),
+            (cart.computed_subtotal, cart.computed_item_count),
+        )
+        self.assertEqual(cart.item_count, 3 * self.BATCHES)
+
+    def test_a_lost_line_race_is_a_conflict(self):
+        cart = Cart.objects.create()
+        url = reverse("cart-items-batch", kwargs={"pk": cart.pk})
+        with mock.patch(
+            "catalog.views.apply_cart_operations", side_effect=IntegrityError
+        ):
+            resp = APIClient().post(url, {"operations": [
+                {"op": "add", "product_id": 1},
+            ]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+
+
+class PriorityFieldTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Priorities")
+        self.product = Product.objects.create(
+            title="Widget", description="d", category=self.category,
+            price="9.99", priority=2, is_featured=True, quantity=5,
+        )
+        self.url = reverse("product-detail", kwargs={"pk": self.product.pk})
+
+    def write_legacy_label(self, label):
+        # SQLite stores any value in an integer column, as rows written
+        # before PriorityField may have.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE catalog_product SET priority = %s WHERE id = %s",
+                [label, self.product.pk],
+            )
+
+    def test_accepts_numbers_and_labels(self):
+        for value, expected in ((4, 4), ("1", 1), ("high", 3),
+                                (" Critical ", 4)):
+            with self.subTest(value=value):
+                resp = self.client.patch(
+                    self.url, {"priority": value}, format="json"
+                )
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                self.assertEqual(resp.data["priority"], expected)
+        for value in ("urgent", 9, True, "", 3.0, "3.0"):
+            with self.subTest(value=value):
+                resp = self.client.patch(
+                    self.url, {"priority": value}, format="json"
+                )
+                self.assertEqual(
+                    resp.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertIn("priority", resp.data)
+
+    def test_orm_parses_labels(self):
+        product = Product.objects.create(
+            title="Labelled", description="d", category=self.category,
+            price=1, priority="High",
+        )
+        self.assertEqual(product.priority, 3)
+        self.assertEqual(
+            Product.objects.filter(priority="high").get().pk, product.pk
+        )
+        product = Product(
+            title="Float", description="d", category=self.category,
+            price=1, priority=3.0,
+        )
+        with self.assertRaises(ValidationError):
+            product.full_clean()
+        with self.assertRaises(ValueError):
+            product.save()
+
+    def test_patch_over_legacy_label_is_a_single_update(self):
+        self.write_legacy_label("high")
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.patch(
+                self.url, {"is_featured": False}, format="json"
+            )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["priority"], 3)
+        updates = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('UPDATE "catalog_product"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).priority, 3)
+
+    def test_migration_normalizes_legacy_values(self):
+        migration = import_module("catalog.migrations.0009_priority_field")
+        self.write_legacy_label("Critical")
+        legacy = Product.objects.create(
+            title="Old", description="d", category=self.category, price=1,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE catalog_product SET priority = 'unknown' "
+                "WHERE id = %s", [legacy.pk],
+            )
+        migration.normalize_priorities(
+            django_apps, SimpleNamespace(connection=connection)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, priority, typeof(priority) FROM catalog_product "
+                "ORDER BY id"
+            )
+            rows = cursor.fetchall()
+        self.assertEqual(
+            rows, [(self.product.pk, 4, "integer"), (legacy.pk, 2, "integer")]
+        )
+
+
+class ProductChangesTests(APITestCase):
+    url = reverse("product-changes")
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Sync")
+        self.products = [
+            Product.objects.create(
+                title=f"Synced {i}", description="d", category=self.category,
+                price=10 + i, quantity=5,
+            )
+            for i in range(3)
+        ]
+
+    def poll(self, since=None):
+        params = {} if since is None else {"since": since}
+        resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data
+
+    def synced_ids(self, data):
+        return [product["id"] for product in data["products"]]
+
+    def test_first_poll_returns_the_catalog(self):
+        data = self.poll()
+        self.assertEqual(
+            self.synced_ids(data), [p.pk for p in self.products]
+        )
+        self.assertEqual(data["products"][0]["category_name"], "Sync")
+        self.assertEqual(
+            [c["id"] for c in data["categories"]], [self.category.pk]
+        )
+        self.assertFalse(data["has_more"])
+        self.assertEqual(data["deleted"], [])
+
+        again = self.poll(data["cursor"])
+        self.assertEqual(again["cursor"], data["cursor"])
+        self.assertEqual(again["products"], [])
+        self.assertEqual(again["categories"], [])
+
+    def test_returns_only_changes_since_the_cursor(self):
+        cursor = self.poll()["cursor"]
+        first, second, third = self.products
+        self.client.patch(
+            reverse("product-detail", kwargs={"pk": first.pk}),
+            {"price": "99.00"}, format="json",
+        )
+        third_pk = third.pk
+        third.delete()
+        created = Product.objects.create(
+            title="New", description="d", category=self.category, price=1,
+        )
+
+        data = self.poll(cursor)
+        self.assertEqual(self.synced_ids(data), [first.pk, created.pk])
+        self.assertEqual(data["products"][0]["price"], "99.00")
+        self.assertEqual(data["deleted"], [third_pk])
+        self.assertGreater(data["cursor"], cursor)
+
+    def test_product_changed_again_is_listed_once(self):
+        cursor = self.poll()["cursor"]
+        product = self.products[0]
+        for title in ("One", "Two"):
+            product.title = title
+            product.save()
+        data = self.poll(cursor)
+        self.assertEqual(self.synced_ids(data), [product.pk])
+        self.assertEqual(data["products"][0]["title"], "Two")
+        self.assertEqual(
+            CatalogChange.objects.filter(
+                kind="product", object_id=product.pk
+            ).count(),
+            1,
+        )
+
+    def test_renaming_a_category_resyncs_its_products(self):
+        cursor = self.poll()["cursor"]
+        self.category.name = "Renamed"
+        self.category.save()
+        data = self.poll(cursor)
+        self.assertEqual(data["categories"][0]["name"], "Renamed")
+        self.assertEqual(
+            self.synced_ids(data), [p.pk for p in self.products]
+        )
+
+    def test_deleting_a_category_tombstones_its_products(self):
+        cursor = self.poll()["cursor"]
+        category_pk = self.category.pk
+        self.category.delete()
+        data = self.poll(cursor)
+        self.assertEqual(data["deleted_categories"], [category_pk])
+        self.assertEqual(
+            sorted(data["deleted"]), [p.pk for p in self.products]
+        )
+        self.assertEqual(data["products"], [])
+
+    def test_pages_through_long_logs(self):
+        seen, cursor = [], 0
+        with self.settings(CATALOG_CHANGES_PAGE_SIZE=2):
+            while True:
+                data = self.poll(cursor)
+                self.assertLessEqual(
+                    len(data["products"]) + len(data["categories"]), 2
+                )
+                seen += self.synced_ids(data)
+                cursor = data["cursor"]
+                if not data["has_more"]:
+                    break
+        self.assertEqual(seen, [p.pk for p in self.products])
+
+    def test_rejects_invalid_cursors(self):
+        for since in ("-1", "abc", str(2 ** 63), "9" * 23):
+            with self.subTest(since=since):
+                resp = self.client.get(self.url, {"since": since})
+                self.assertEqual(
+                    resp.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertIn("since", resp.data)
+        self.assertEqual(self.poll(2 ** 63 - 1)["cursor"], 2 ** 63 - 1)
+
+    def test_bulk_writes_are_logged(self):
+        cursor = self.poll()["cursor"]
+        rows = [
+            json.dumps({"id": self.products[0].pk, "price": "1.50"}),
+            json.dumps({
+                "title": "Imported", "description": "d",
+                "category": "Sync", "price": "2.00",
+            }),
+        ]
+        result = import_products(rows, "ndjson")
+        self.assertEqual((result.created, result.updated), (1, 1))
+        imported = Product.objects.get(title="Imported")
+        data = self.poll(cursor)
+        self.assertEqual(
+            self.synced_ids(data), [self.products[0].pk, imported.pk]
+        )
+
+        cart = Cart.objects.create()
+        CartItem.objects.create(
+            cart=cart, product=self.products[1], quantity=2
+        )
+        cursor = data["cursor"]
+        resp = self.client.post(
+            reverse("cart-checkout", kwargs={"pk": cart.pk})
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = self.poll(cursor)
+        self.assertEqual(self.synced_ids(data), [self.products[1].pk])
+        self.assertEqual(data["products"][0]["quantity"], 3)
+
+    def test_seed_data_logs_wiped_and_generated_rows(self):
+        cursor = self.poll()["cursor"]
+        call_command(
+            "seed_data", products=2, categories=1, carts=0, stdout=io.StringIO()
+        )
+        data = self.poll(cursor)
+        seeded = list(
+            Product.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(self.synced_ids(data), seeded)
+        # Wiped products that were not generated again are gone for good.
+        self.assertEqual(
+            data["deleted"],
+            sorted({p.pk for p in self.products} - set(seeded)),
+        )
@@ -1,47 +1,293 @@
 # catalog/views.py
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
+from .batch import BatchError, apply_cart_operations
+from .categories import category_map
+from .checkout import EmptyCart, OutOfStock, checkout_cart, is_lock_timeout
+from .conditional import ConditionalGetMixin
+from .exporters import EXPORTERS, export_rows
+from .facets import cached_facet_counts
+from . import changes as change_log
+from . import featured as featured_feed
+from .importers import CONTENT_TYPES, DEFAULT_BATCH_SIZE, import_products
 from .models import Product, Category, Cart, CartItem
+from .pagination import CatalogPagination
+from .renderers import CSVRenderer, NDJSONRenderer
+from .search import ProductOrderingFilter, ProductSearchFilter
 from .serializers import (
     ProductSerializer,
     CategorySerializer,
     CartSerializer,
     CartItemSerializer,
+    CartBatchSerializer,
 )
 
-class CategoryViewSet(viewsets.ModelViewSet):
+MAX_CURSOR = 2 ** 63 - 1
+
+
+def cart_items_prefetch():
+    """Prefetch for `Cart.items` that also joins each item's product, which
+    `CartItemSerializer` renders for every line."""
+    return Prefetch(
+        'items', queryset=CartItem.objects.select_related('product'),
+    )
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    pagination_class = CatalogPagination
+
+    # Reads come from the process-local category map (catalog/categories.py)
+    # and skip the database entirely, except keyset pages.
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator.use_keyset(request):
+            return super().list(request, *args, **kwargs)
+        snapshot = category_map.current()
+        return self.conditional_response(
+            self.collection_validators(len(snapshot), snapshot.version),
+            lambda: self.paginated_response(snapshot.categories()),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        instance = category_map.get(int(pk)) if str(pk).isdigit() else None
+        if instance is None:
+            raise Http404
+        return self.conditional_response(
+            self.instance_validators(instance),
+            lambda: Response(self.get_serializer(instance).data),
+        )
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    # `category_name` comes from the category map, so product queries never
+    # join the category table.
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    pagination_class = CatalogPagination
+    featured_pagination_class = PageNumberPagination
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter,
+        ProductSearchFilter,
+        ProductOrderingFilter,
     ]
     filterset_fields = ['category', 'priority', 'is_featured']
     search_fields = ['title', 'description']
+    # Query parameters that change which products `facets` counts.
+    facet_params = ['category', 'priority', 'is_featured', 'search']
     ordering_fields = ['created_at', 'price', 'priority']
     ordering = ['-created_at']
+    # List pages are paginated as `values()` rows carrying only what the
+    # serializer cache key and the keyset cursor read; CachedListSerializer
+    # builds cache misses from one more `values()` query, never from models.
+    list_row_fields = ['id', 'updated_at', 'created_at', 'price', 'priority']
+    # Replicas are fine for most reads; `changes` overrides this per action.
+    read_from_primary = False
+
+    def make_validators(self, *parts):
+        # Payloads embed `category_name`, so category edits count too.
+        return super().make_validators(*parts, category_map.version())
+
+    def list_rows(self, queryset):
+        # Relevance ranks (extra selects) must stay selectable for ORDER BY.
+        return queryset.values(
+            *self.list_row_fields, *queryset.query.extra_select
+        )
+
+    def paginated_response(self, queryset):
+        return super().paginated_response(self.list_rows(queryset))
 
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        featured_products = self.get_queryset().filter(is_featured=True)
-        serializer = self.get_serializer(featured_products, many=True)
-        return Response(serializer.data)
+        """
+        Featured products, highest priority first and newest first within a
+        priority, paginated from the precomputed feed (catalog/featured.py).
+        """
+        position, keys = featured_feed.current()
+        return self.conditional_response(
+            self.collection_validators(position),
+            lambda: self.featured_page(keys),
+        )
+
+    def featured_page(self, keys):
+        # Page numbers only: the feed is an ordered list, not a queryset.
+        paginator = self.featured_pagination_class()
+        for attempt in range(2):
+            page_keys = paginator.paginate_queryset(
+                keys, self.request, view=self,
+            )
+            rows = self.list_rows(self.get_queryset().filter(
+                pk__in=[featured_feed.product_id(key) for key in page_keys],
+                is_featured=True,
+            ))
+            if featured_feed.matches(page_keys, rows) or attempt:
+                break
+            # Changed without reaching the change log (raw SQL).
+            keys = featured_feed.rebuild()
+        by_id = {row['id']: row for row in rows}
+        page = [
+            by_id[featured_feed.product_id(key)] for key in page_keys
+            if featured_feed.product_id(key) in by_id
+        ]
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
+    # The log lives on the primary only; product rows read from a lagging
+    # replica would be older than the cursor handed out with them.
+    @action(detail=False, methods=['get'], read_from_primary=True)
+    def changes(self, request):
+        """
+        Products and categories created, updated or deleted after the
+        `?since=` cursor (catalog/changes.py), at most
+        `CATALOG_CHANGES_PAGE_SIZE` changes per response, with the cursor to
+        send next.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+            # Cursors are log positions, stored as signed 64-bit integers.
+            if not 0 <= since <= MAX_CURSOR:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'since': [f'Must be an integer from 0 to {MAX_CURSOR}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        cursor, has_more, changed, deleted = change_log.since(
+            since, settings.CATALOG_CHANGES_PAGE_SIZE,
+        )
+        products = changed.get('product', [])
+        if products:
+            rows = self.list_rows(
+                self.get_queryset().filter(pk__in=products).order_by('pk')
+            )
+            products = self.get_serializer(rows, many=True).data
+        categories = changed.get('category', [])
+        if categories:
+            categories = CategorySerializer(
+                Category.objects.filter(pk__in=categories).order_by('pk'),
+                many=True,
+            ).data
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'products': products,
+            'deleted': deleted.get('product', []),
+            'categories': categories,
+            'deleted_categories': deleted.get('category', []),
+        })
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Counts per category, priority, `is_featured` and price bucket over
+        the products matching the list filters and search.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        # The log position and category names version the counts without
+        # scanning the filtered products, as a fingerprint would.
+        version = [change_log.position(), category_map.version()]
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name in self.facet_params
+            for value in values
+        )
+        return self.conditional_response(
+            self.collection_validators(*version),
+            lambda: Response(cached_facet_counts(queryset, (params, version))),
+        )
+
+    @action(
+        detail=False, methods=['get'],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        """
+        Stream every product matching the list filters, search and ordering
+        as NDJSON (default) or CSV (`?format=csv`), unpaginated.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        renderer = request.accepted_renderer
+        chunk_size = settings.CATALOG_EXPORT_CHUNK_SIZE
+        rows = export_rows(queryset, self.serializer_class, chunk_size)
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](rows, chunk_size),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="products.{renderer.format}"'
+        )
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Stream NDJSON (`application/x-ndjson`) or CSV (`text/csv`) product
+        rows from the request body. Rows with an `id` update that product,
+        others are created; `?batch_size=` sets the chunk size.
+        """
+        fmt = CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+        if fmt is None:
+            return Response(
+                {'detail': 'Send application/x-ndjson or text/csv.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            batch_size = int(
+                request.query_params.get('batch_size', DEFAULT_BATCH_SIZE)
+            )
+            if batch_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'batch_size': ['Must be a positive integer.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # Read the body line by line instead of letting a parser load it.
+        lines = request.stream or ()
+        result = import_products(lines, fmt, batch_size=batch_size)
+        return Response(result.as_dict())
 
 
 class CartViewSet(viewsets.ModelViewSet):
     queryset = Cart.objects.all()
+    # Carts show live prices and stock; never read them from a lagging
+    # replica (see showcase_api/routers.py).
+    read_from_primary = True
+    # Seconds a checkout that lost the write lock asks the client to wait.
+    checkout_retry_after = 1
     # dynamic serializer assignment below
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = self.with_items(queryset)
+        return queryset
+
+    @staticmethod
+    def with_items(queryset):
+        # Totals are stored on the cart row; items and their products arrive
+        # in one extra prefetch query.
+        return queryset.prefetch_related(cart_items_prefetch())
+
+    def cart_response(self, cart):
+        """Re-read `cart` with its stored totals and items (they may have
+        just been mutated) and serialize it."""
+        cart = self.with_items(Cart.objects.filter(pk=cart.pk)).get()
+        return Response(CartSerializer(cart).data)
+
     def get_serializer_class(self):
         # simple dynamic wiring using defined serializers
         # ensure serializers reference the actual Cart/CartItem models
@@ -52,7 +298,6 @@ class CartViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         cart = self.get_object()
         serializer = CartSerializer(cart)
-        # compute total on serializer get_total
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
@@ -65,35 +310,51 @@ class CartViewSet(viewsets.ModelViewSet):
                 {'detail': 'Quantity must be >= 1'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        product = get_object_or_404(Product, pk=product_id)
-        # stock enforcement
-        if quantity > product.quantity:
-            return Response(
-                {'detail': 'Requested quantity exceeds stock.'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        item, created = CartItem.objects.get_or_create(
-            cart=cart, product=product, defaults={'quantity': quantity}
+        # Read and increment the line under the write lock, so concurrent
+        # adds to the same line queue instead of overwriting each other.
+        with transaction.atomic(savepoint=False):
+            response = self.add_to_line(cart, product_id, quantity)
+        return response or self.cart_response(cart)
+
+    def add_to_line(self, cart, product_id, quantity):
+        """Add `quantity` of a product to `cart`; returns an error response,
+        or None once the line is saved."""
+        # An existing line arrives with its product in one query.
+        item = (
+            CartItem.objects.select_related('product').select_for_update()
+            .filter(cart=cart, product_id=product_id).first()
         )
-        if not created:
-            new_qty = item.quantity + quantity
-            if new_qty > product.quantity:
+        if item is None:
+            product = get_object_or_404(Product, pk=product_id)
+            # stock enforcement
+            if quantity > product.quantity:
                 return Response(
                     {'detail': 'Requested quantity exceeds stock.'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            item.quantity = new_qty
-            item.save()
-
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+            item, created = CartItem.objects.get_or_create(
+                cart=cart, product=product, defaults={'quantity': quantity}
+            )
+            if created:
+                return None
+        new_qty = item.quantity + quantity
+        if new_qty > item.product.quantity:
+            return Response(
+                {'detail': 'Requested quantity exceeds stock.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        item.quantity = new_qty
+        item.save()
+        return None
 
     @action(detail=True, methods=['patch'])
     def update_item(self, request, pk=None):
         cart = self.get_object()
         item_id = request.data.get('item_id')
         quantity = request.data.get('quantity')
-        item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+        item = get_object_or_404(
+            CartItem.objects.select_related('product'), pk=item_id, cart=cart
+        )
         quantity = int(quantity)
         if quantity < 1:
             return Response(
@@ -105,9 +366,10 @@ class CartViewSet(viewsets.ModelViewSet):
                 {'detail': 'Requested quantity exceeds stock.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        item.quantity = quantity
-        item.save()
-        return Response(CartSerializer(cart).data)
+        if quantity != item.quantity:
+            item.quantity = quantity
+            item.save()
+        return self.cart_response(cart)
 
     @action(detail=True, methods=['delete'])
     def remove_item(self, request, pk=None):
@@ -115,5 +377,57 @@ class CartViewSet(viewsets.ModelViewSet):
         item_id = request.data.get('item_id')
         item = get_object_or_404(CartItem, pk=item_id, cart=cart)
         item.delete()
-        return Response(CartSerializer(cart).data)
+        return self.cart_response(cart)
+
+    @action(
+        detail=True, methods=['post'],
+        url_path='items/batch', url_name='items-batch',
+    )
+    def items_batch(self, request, pk=None):
+        cart = self.get_object()
+        batch = CartBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        try:
+            apply_cart_operations(cart, batch.validated_data['operations'])
+        except BatchError as exc:
+            return Response(
+                {'operations': exc.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except IntegrityError:
+            # Another request added one of the lines first; batches only
+            # race like this where transactions do not lock at BEGIN.
+            return Response(
+                {'detail': 'The cart changed during the batch; retry it.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return self.cart_response(cart)
 
+    @action(detail=True, methods=['post'])
+    def checkout(self, request, pk=None):
+        cart = self.get_object()
+        try:
+            receipt = checkout_cart(cart)
+        except EmptyCart:
+            return Response(
+                {'detail': 'Cart is empty.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except OutOfStock as exc:
+            return Response(
+                {'detail': str(exc), 'failures': exc.failures},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except OperationalError as exc:
+            # Only lock timeouts are worth retrying; anything else is a
+            # real failure.
+            if not is_lock_timeout(exc):
+                raise
+            # SQLite gave up waiting for the write lock (busy_timeout);
+            # nothing was reserved, so the client can simply try again.
+            return Response(
+                {'detail': 'The store is busy; retry the checkout.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(self.checkout_retry_after)},
+            )
+        return Response(receipt)
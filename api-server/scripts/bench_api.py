@@ -0,0 +1,415 @@
+"""
+Benchmark every catalog endpoint and compare runs against a saved baseline.
+
+Each scenario is one request shape: product list, search, filters,
+ordering, keyset pages, detail, `featured`, facets, the category list, and every
+cart action. Requests are issued one after another by a single client;
+mutating scenarios (cart actions) create whatever they act on before each
+timed request. Per scenario the run records p50/p95/p99 and mean latency,
+requests per second and the number of SQL queries per request.
+
+In-process (default) the requests go through Django's test client against a
+scratch SQLite database seeded with `seed_data`, or against `--db`. With
+`--url` they go over HTTP to a running server; that mode creates carts and
+reserves stock in whatever database the server uses, and only reports SQL
+counts when the server sends them in a `Server-Timing` header.
+
+Usage (from api-server/):
+    python scripts/bench_api.py --save baseline.json
+    python scripts/bench_api.py --compare baseline.json --tolerance 0.2
+    python scripts/bench_api.py --url http://localhost:8000 --only product
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from http.client import HTTPConnection, HTTPSConnection
+from itertools import cycle
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'showcase_api.settings')
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument(
+    '--url', help='benchmark a running server instead of the app in-process',
+)
+parser.add_argument(
+    '--db', help='in-process: use this SQLite file instead of a fresh one',
+)
+parser.add_argument(
+    '--products', type=int, default=10000,
+    help='products to seed into the scratch database (default: 10000)',
+)
+parser.add_argument(
+    '--requests', type=int, default=200,
+    help='timed requests per scenario (default: 200)',
+)
+parser.add_argument(
+    '--warmup', type=int, default=20,
+    help='untimed requests per scenario first (default: 20)',
+)
+parser.add_argument(
+    '--only', nargs='+', default=[],
+    help='run scenarios whose name starts with any of these prefixes',
+)
+parser.add_argument('--save', help='write the results to this JSON file')
+parser.add_argument('--compare', help='baseline JSON file to compare against')
+parser.add_argument(
+    '--tolerance', type=float, default=0.15,
+    help='allowed relative slowdown before a metric counts as a regression '
+         '(default: 0.15)',
+)
+args = parser.parse_args()
+
+
+class InProcessClient:
+    """Drive the app through Django's test client, counting queries."""
+
+    def __init__(self):
+        from django.conf import settings
+
+        if args.db:
+            settings.DATABASES['default']['NAME'] = args.db
+        else:
+            settings.DATABASES['default']['NAME'] = os.path.join(
+                tempfile.mkdtemp(), 'bench.sqlite3'
+            )
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['*']
+
+        import django
+
+        django.setup()
+
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext
+
+        if not args.db:
+            call_command('migrate', verbosity=0)
+            call_command(
+                'seed_data', products=args.products,
+                categories=max(1, args.products // 200),
+                carts=0, seed=0, stdout=open(os.devnull, 'w'),
+            )
+        self.client = Client()
+        self.capture = lambda: CaptureQueriesContext(connection)
+        self.description = f'in-process ({settings.DATABASES["default"]["NAME"]})'
+
+    def request(self, method, path, body=None):
+        """Return `(status, parsed JSON or None, SQL queries or None)`."""
+        with self.capture() as queries:
+            response = self.client.generic(
+                method, path,
+                json.dumps(body) if body is not None else '',
+                content_type='application/json',
+                HTTP_ACCEPT='application/json',
+            )
+        return response.status_code, parse(response.content), len(queries)
+
+    def timed(self, method, path, body=None):
+        payload = json.dumps(body) if body is not None else ''
+        start = time.perf_counter()
+        response = self.client.generic(
+            method, path, payload,
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        elapsed = time.perf_counter() - start
+        return response.status_code, elapsed
+
+
+def no_delay(connection_class):
+    """`connection_class` with Nagle's algorithm off; http.client writes
+    headers and body separately, and delayed ACKs would otherwise add ~40ms
+    to every request with a body."""
+    class Connection(connection_class):
+        def connect(self):
+            super().connect()
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return Connection
+
+
+class HTTPClient:
+    """
+    Drive a running server, one connection per request. Reused keep-alive
+    connections stall on `runserver`, which writes headers and body
+    separately, so fresh connections give the steadier numbers locally.
+    """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = no_delay(
+            HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        )
+        self.connection = connection_class(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+        self.description = url
+
+    def send(self, method, path, body=None):
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.connection.request(
+            method, self.prefix + path, body=payload, headers=headers
+        )
+        response = self.connection.getresponse()
+        content = response.read()
+        self.connection.close()
+        return response, content
+
+    def request(self, method, path, body=None):
+        response, content = self.send(method, path, body)
+        return response.status, parse(content), server_queries(response)
+
+    def timed(self, method, path, body=None):
+        start = time.perf_counter()
+        response, _ = self.send(method, path, body)
+        return response.status, time.perf_counter() - start
+
+
+def parse(content):
+    try:
+        return json.loads(content) if content else None
+    except ValueError:
+        return None
+
+
+def server_queries(response):
+    """Read a `sql;desc="N queries"`-style entry from Server-Timing, if any."""
+    for entry in (response.getheader('Server-Timing') or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        if name != 'sql':
+            continue
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'desc':
+                count = value.strip('"').split()[0]
+                if count.isdigit():
+                    return int(count)
+    return None
+
+
+class Fixtures:
+    """Ids the scenarios act on, discovered through the API itself so both
+    modes work the same way."""
+
+    def __init__(self, client):
+        self.client = client
+        _, page, _ = client.request('GET', '/api/products/')
+        # Checkouts need stock; act on the best-stocked products of the page.
+        products = sorted(
+            page['results'], key=lambda product: -product['quantity']
+        )
+        if len(products) < 5:
+            sys.exit('The database needs at least 5 products; run seed_data.')
+        self.product_ids = [product['id'] for product in products[:5]]
+        self.product = products[0]
+        self.search_term = self.product['title'].split()[0]
+        self.category_id = self.product['category']
+        _, cart, _ = client.request('POST', '/api/carts/', {})
+        for product_id in self.product_ids[:3]:
+            self.add(cart['id'], product_id)
+        self.cart_id = cart['id']
+
+    def new_cart(self):
+        _, cart, _ = self.client.request('POST', '/api/carts/', {})
+        return cart['id']
+
+    def add(self, cart_id, product_id, quantity=1):
+        _, cart, _ = self.client.request(
+            'POST', f'/api/carts/{cart_id}/add_item/',
+            {'product_id': product_id, 'quantity': quantity},
+        )
+        return cart
+
+    def cart_with_item(self, product_id=None):
+        cart_id = self.new_cart()
+        cart = self.add(cart_id, product_id or self.product_ids[0])
+        return cart_id, cart['items'][0]['id']
+
+
+def scenarios(fx):
+    """`(name, prepare)` pairs; `prepare()` does any untimed setup and
+    returns the `(method, path, body)` to time."""
+    def get(path, **params):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        return lambda: ('GET', path, None)
+
+    def add_item():
+        return ('POST', f'/api/carts/{fx.new_cart()}/add_item/',
+                {'product_id': fx.product_ids[0], 'quantity': 1})
+
+    def update_item():
+        cart_id, item_id = fx.cart_with_item()
+        return ('PATCH', f'/api/carts/{cart_id}/update_item/',
+                {'item_id': item_id, 'quantity': 2})
+
+    def remove_item():
+        cart_id, item_id = fx.cart_with_item()
+        return ('DELETE', f'/api/carts/{cart_id}/remove_item/',
+                {'item_id': item_id})
+
+    def items_batch():
+        operations = [
+            {'op': 'add', 'product_id': pk, 'quantity': 1}
+            for pk in fx.product_ids
+        ]
+        return ('POST', f'/api/carts/{fx.new_cart()}/items/batch/',
+                {'operations': operations})
+
+    # Checkouts reserve stock; spread them over the best-stocked products.
+    stocked = cycle(fx.product_ids)
+
+    def checkout():
+        cart_id, _ = fx.cart_with_item(next(stocked))
+        return ('POST', f'/api/carts/{cart_id}/checkout/', {})
+
+    return [
+        ('product-list', get('/api/products/')),
+        ('product-list-page-20', get('/api/products/', page=20)),
+        ('product-list-cursor', get('/api/products/', pagination='cursor')),
+        ('product-search', get('/api/products/', search=fx.search_term)),
+        ('product-filter', get(
+            '/api/products/', category=fx.category_id, priority=2,
+        )),
+        ('product-ordering', get('/api/products/', ordering='-price')),
+        ('product-detail', get(f'/api/products/{fx.product["id"]}/')),
+        ('product-featured', get('/api/products/featured/')),
+        ('product-facets', get('/api/products/facets/')),
+        ('product-facets-search', get(
+            '/api/products/facets/', search=fx.search_term,
+        )),
+        ('category-list', get('/api/categories/')),
+        ('cart-create', lambda: ('POST', '/api/carts/', {})),
+        ('cart-retrieve', get(f'/api/carts/{fx.cart_id}/')),
+        ('cart-add-item', add_item),
+        ('cart-update-item', update_item),
+        ('cart-remove-item', remove_item),
+        ('cart-items-batch', items_batch),
+        ('cart-checkout', checkout),
+    ]
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_scenario(client, prepare):
+    _, _, queries = client.request(*prepare())
+    for _ in range(args.warmup):
+        client.timed(*prepare())
+    latencies, errors = [], 0
+    for _ in range(args.requests):
+        status, elapsed = client.timed(*prepare())
+        latencies.append(elapsed)
+        errors += status >= 400
+    latencies.sort()
+    ms = 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * ms, 3),
+        'p95_ms': round(percentile(latencies, 95) * ms, 3),
+        'p99_ms': round(percentile(latencies, 99) * ms, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * ms, 3),
+        'rps': round(len(latencies) / sum(latencies), 1),
+        'queries': queries,
+    }
+
+
+# (metric, higher is worse, exact): exact metrics may not grow at all.
+COMPARED = [
+    ('p50_ms', True, False),
+    ('p95_ms', True, False),
+    ('p99_ms', True, False),
+    ('rps', False, False),
+    ('queries', True, True),
+]
+
+
+def compare(results, baseline, tolerance):
+    """Print each metric next to the baseline; return the regressions."""
+    regressions = []
+    print(f"\nCompared with {args.compare} (tolerance {tolerance:.0%}):")
+    print(f"{'scenario':<22}{'metric':<9}{'baseline':>11}{'current':>11}"
+          f"{'change':>9}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f'{name:<22}(not in baseline)')
+            continue
+        for metric, higher_is_worse, exact in COMPARED:
+            old, new = before.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = change if higher_is_worse else -change
+            limit = 0 if exact else tolerance
+            flag = ''
+            if worse > limit:
+                flag = '  REGRESSION'
+                regressions.append((name, metric, old, new))
+            print(f'{name:<22}{metric:<9}{old:>11}{new:>11}'
+                  f'{change:>+9.1%}{flag}')
+    return regressions
+
+
+def main():
+    client = HTTPClient(args.url) if args.url else InProcessClient()
+    fixtures = Fixtures(client)
+    selected = [
+        (name, prepare) for name, prepare in scenarios(fixtures)
+        if not args.only or name.startswith(tuple(args.only))
+    ]
+    print(f'Target: {client.description}')
+    print(f'{args.requests} requests per scenario after {args.warmup} '
+          f'warm-up requests, one client\n')
+    print(f"{'scenario':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'req/s':>9}{'queries':>9}{'errors':>8}")
+    results = {}
+    for name, prepare in selected:
+        result = results[name] = run_scenario(client, prepare)
+        queries = '-' if result['queries'] is None else result['queries']
+        print(f"{name:<22}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{result['rps']:>9.1f}{queries:>9}"
+              f"{result['errors']:>8}")
+
+    if args.save:
+        document = {
+            'meta': {
+                'target': client.description,
+                'requests': args.requests,
+                'warmup': args.warmup,
+                'python': platform.python_version(),
+                'created': datetime.now(timezone.utc).isoformat(),
+            },
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as handle:
+            json.dump(document, handle, indent=2)
+        print(f'\nSaved {args.save}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s).')
+            sys.exit(1)
+        print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark `GET /api/products/` latency with and without the Product indexes.
+
+Builds a scratch SQLite database, grows it to each requested size and times
+the list endpoint's filter/ordering combinations twice: once with the
+indexes declared in `Product.Meta.indexes` dropped ("before") and once with
+them in place ("after").
+
+Usage (from api-server/):
+    python scripts/bench_product_list.py
+    python scripts/bench_product_list.py --sizes 10000 100000 --repeat 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'showcase_api.settings')
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument(
+    '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+)
+parser.add_argument('--repeat', type=int, default=20)
+parser.add_argument('--categories', type=int, default=20)
+parser.add_argument(
+    '--db', help='SQLite file to use (default: a temporary file)',
+)
+args = parser.parse_args()
+
+from django.conf import settings  # noqa: E402
+
+db_path = args.db or os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+settings.DATABASES['default']['NAME'] = db_path
+settings.DEBUG = False
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from catalog.models import Category, Product  # noqa: E402
+
+BATCH_SIZE = 5000
+
+
+def seed(target, rng):
+    categories = list(Category.objects.all())
+    if not categories:
+        Category.objects.bulk_create(
+            Category(name=f'Category {i}') for i in range(args.categories)
+        )
+        categories = list(Category.objects.all())
+    current = Product.objects.count()
+    while current < target:
+        size = min(BATCH_SIZE, target - current)
+        Product.objects.bulk_create([
+            Product(
+                title=f'Product {current + i}',
+                description='Synthetic benchmark product',
+                category=rng.choice(categories),
+                price=Decimal(rng.randint(100, 100_000)) / 100,
+                priority=rng.randint(1, 4),
+                is_featured=rng.random() < 0.001,
+                quantity=rng.randint(0, 500),
+            )
+            for i in range(size)
+        ])
+        current += size
+    # auto_now_add stamps every row with "now"; spread created_at over a
+    # year so the default ordering has realistic cardinality.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE catalog_product SET created_at = "
+            "datetime('2024-01-01', '+' || ((id * 7919) % 31536000) "
+            "|| ' seconds')"
+        )
+        cursor.execute('ANALYZE')
+    return categories
+
+
+def set_indexes(enabled):
+    existing = set(
+        connection.introspection.get_constraints(
+            connection.cursor(), Product._meta.db_table
+        )
+    )
+    with connection.schema_editor() as editor:
+        for index in Product._meta.indexes:
+            if enabled and index.name not in existing:
+                editor.add_index(Product, index)
+            elif not enabled and index.name in existing:
+                editor.remove_index(Product, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def scenarios(category):
+    return [
+        ('default (-created_at)', '/api/products/', {}),
+        ('category', '/api/products/', {'category': category.pk}),
+        ('priority', '/api/products/', {'priority': 3}),
+        ('is_featured', '/api/products/', {'is_featured': 'true'}),
+        ('ordering=price', '/api/products/', {'ordering': 'price'}),
+        ('ordering=-priority', '/api/products/', {'ordering': '-priority'}),
+        (
+            'category+ordering=price',
+            '/api/products/',
+            {'category': category.pk, 'ordering': 'price'},
+        ),
+        ('featured', '/api/products/featured/', {}),
+    ]
+
+
+def measure(client, path, params):
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        resp = client.get(path, params)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert resp.status_code == 200, resp.status_code
+    return statistics.median(timings)
+
+
+def main():
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    rng = random.Random(42)
+    client = APIClient()
+    print(f'database: {db_path}')
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        categories = seed(size, rng)
+        print(
+            f'\n{size:,} products (seeded in '
+            f'{time.perf_counter() - started:.1f}s), median ms over '
+            f'{args.repeat} requests'
+        )
+        print(f"{'scenario':<26}{'before':>10}{'after':>10}{'speedup':>10}")
+        results = {}
+        for enabled in (False, True):
+            set_indexes(enabled)
+            for name, path, params in scenarios(categories[0]):
+                results.setdefault(name, []).append(
+                    measure(client, path, params)
+                )
+        for name, (before, after) in results.items():
+            print(
+                f'{name:<26}{before:>10.2f}{after:>10.2f}'
+                f'{before / after:>9.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare product list serialization throughput: ModelSerializer vs values().
+
+"model" is the regular path: load `Product` instances with their category,
+run `ProductSerializer.to_representation` field by field and render with
+DRF's `JSONRenderer`. "values" builds the same payload from `values()` rows
+with `ValuesRepresentation` and renders with `FastJSONRenderer` (orjson when
+installed). The serializer cache is disabled so both paths do full work.
+
+Usage (from api-server/):
+    python scripts/bench_serializers.py
+    python scripts/bench_serializers.py --rows 10 100 1000 --seconds 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'showcase_api.settings')
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000])
+parser.add_argument(
+    '--seconds', type=float, default=2.0,
+    help='time budget per measurement',
+)
+args = parser.parse_args()
+
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES['default']['NAME'] = os.path.join(
+    tempfile.mkdtemp(), 'bench.sqlite3'
+)
+settings.DEBUG = False
+settings.CATALOG_SERIALIZER_CACHE = None
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from catalog.models import Category, Product  # noqa: E402
+from catalog.renderers import FastJSONRenderer, orjson  # noqa: E402
+from catalog.representations import values_representation  # noqa: E402
+from catalog.serializers import ProductSerializer  # noqa: E402
+
+
+def seed(count):
+    category = Category.objects.create(name='Benchmark')
+    Product.objects.bulk_create(
+        Product(
+            title=f'Product {i}',
+            description='Synthetic benchmark product ' * 4,
+            category=category,
+            price=Decimal(i % 10_000) / 100,
+            priority=1 + i % 4,
+            is_featured=i % 7 == 0,
+            image_url=f'https://example.com/{i}.png',
+            quantity=i % 50,
+        )
+        for i in range(count)
+    )
+
+
+def model_path(limit):
+    queryset = Product.objects.select_related('category').order_by('-pk')
+    serializer = ProductSerializer()
+    data = [
+        serializer.build_representation(product)
+        for product in queryset[:limit]
+    ]
+    return JSONRenderer().render(data)
+
+
+def values_path(limit):
+    representation = values_representation(ProductSerializer)
+    rows = Product.objects.order_by('-pk').values(*representation.lookups)
+    data = [representation.build(row) for row in rows[:limit]]
+    return FastJSONRenderer().render(data)
+
+
+def throughput(func, limit):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        func(limit)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    call_command('migrate', verbosity=0)
+    seed(max(args.rows))
+    assert model_path(max(args.rows)) == values_path(max(args.rows))
+    print(f"orjson: {'yes' if orjson else 'no (stdlib json)'}")
+    print(f"{'rows':>6}{'model req/s':>14}{'values req/s':>14}{'speedup':>10}")
+    for limit in args.rows:
+        model = throughput(model_path, limit)
+        fast = throughput(values_path, limit)
+        print(f'{limit:>6}{model:>14.1f}{fast:>14.1f}{fast / model:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Mixed read/write load on the cart endpoints: stock SQLite vs the tuned setup.
+
+Each mode runs in its own process against its own copy of one seeded
+database, with `--threads` clients calling the WSGI application directly
+(as gunicorn's threaded workers would, connection handling included):
+
+    default  django.db.backends.sqlite3, rollback journal, CONN_MAX_AGE = 0
+    tuned    DATABASES as configured in settings.py (WAL, synchronous =
+             NORMAL, busy_timeout, mmap/cache sizes, BEGIN IMMEDIATE and
+             persistent connections)
+
+Every client owns a cart. A `--write-ratio` share of its requests modify it
+(add_item, update_item, or an items/batch removal, which runs in a
+transaction); the rest read a random cart. The run reports throughput,
+failed requests and read/write p50/p95/p99 for each mode.
+
+Usage (from api-server/):
+    python scripts/bench_sqlite.py --threads 16 --seconds 10 --write-ratio 0.3
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'showcase_api.settings')
+
+MODES = ('default', 'tuned')
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument(
+    '--threads', type=int, default=16,
+    help='concurrent clients (default: 16)',
+)
+parser.add_argument(
+    '--seconds', type=float, default=10.0,
+    help='measurement time per mode (default: 10)',
+)
+parser.add_argument(
+    '--write-ratio', type=float, default=0.3,
+    help='share of requests that modify a cart (default: 0.3)',
+)
+parser.add_argument(
+    '--products', type=int, default=10000,
+    help='products to seed (default: 10000)',
+)
+parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+parser.add_argument('--db', help=argparse.SUPPRESS)
+parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+
+def setup_django(mode):
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    database['NAME'] = args.db
+    if mode == 'default':
+        database.update(
+            ENGINE='django.db.backends.sqlite3', CONN_MAX_AGE=0, OPTIONS={},
+        )
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    settings.SLOW_REQUEST_THRESHOLD_MS = None
+
+    import django
+
+    django.setup()
+    # Failed requests are counted, not logged.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+
+def prepare():
+    """Migrate and seed `--db`, then leave it in rollback-journal mode."""
+    setup_django('default')
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    call_command(
+        'seed_data', products=args.products,
+        categories=max(1, args.products // 200), seed=0,
+        stdout=open(os.devnull, 'w'),
+    )
+    from django.db import connection
+
+    connection.close()
+    with sqlite3.connect(args.db) as db:
+        db.execute('PRAGMA journal_mode = delete')
+
+
+class WSGIClient:
+    def __init__(self, application):
+        self.application = application
+
+    def request(self, method, path, body=None):
+        """Return `(status, parsed JSON body or None)`."""
+        payload = json.dumps(body).encode() if body is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'bench',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'bench',
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': io.BytesIO(payload),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+        }
+        statuses = []
+        result = self.application(
+            environ, lambda status, headers, exc_info=None: statuses.append(status)
+        )
+        try:
+            content = b''.join(result)
+        finally:
+            # What a WSGI server does; fires request_finished, which closes
+            # connections older than CONN_MAX_AGE.
+            result.close()
+        status = int(statuses[0].split()[0])
+        return status, json.loads(content) if status < 300 else None
+
+
+def run(mode):
+    setup_django(mode)
+    from django.core.wsgi import get_wsgi_application
+
+    from catalog.models import Product
+
+    client = WSGIClient(get_wsgi_application())
+    products = list(
+        Product.objects.filter(quantity__gte=50).values_list('id', flat=True)
+    )
+    carts = [
+        client.request('POST', '/api/carts/', {})[1]['id']
+        for _ in range(args.threads)
+    ]
+    from django.db import connection
+
+    connection.close()
+
+    samples = {'read': [], 'write': []}
+    failures = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        cart = carts[index]
+        items = []
+        barrier.wait()
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            if rng.random() < args.write_ratio:
+                kind = 'write'
+                if len(items) < 3:
+                    request = ('POST', f'/api/carts/{cart}/add_item/',
+                               {'product_id': rng.choice(products),
+                                'quantity': 1})
+                elif rng.random() < 0.5:
+                    request = ('PATCH', f'/api/carts/{cart}/update_item/',
+                               {'item_id': rng.choice(items),
+                                'quantity': rng.randint(1, 5)})
+                else:
+                    request = ('POST', f'/api/carts/{cart}/items/batch/',
+                               {'operations': [{'op': 'remove',
+                                                'item_id': items[0]}]})
+            else:
+                kind = 'read'
+                request = ('GET', f'/api/carts/{rng.choice(carts)}/', None)
+            start = time.perf_counter()
+            try:
+                status, body = client.request(*request)
+            except Exception:
+                status, body = 500, None
+            elapsed = time.perf_counter() - start
+            if kind == 'write' and body is not None:
+                items = [item['id'] for item in body['items']]
+            with lock:
+                samples[kind].append(elapsed)
+                if status >= 300:
+                    failures[kind] += 1
+
+    threads = [
+        threading.Thread(target=worker, args=(i,))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        kind: {
+            'requests': len(latencies),
+            'failed': failures[kind],
+            **{f'p{p}': percentile(sorted(latencies), p) for p in (50, 95, 99)},
+        }
+        for kind, latencies in samples.items()
+    }))
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def child(*extra):
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *sys.argv[1:], *extra],
+        check=True, stdout=subprocess.PIPE, text=True,
+    ).stdout
+
+
+def main():
+    if args.prepare:
+        return prepare()
+    if args.mode:
+        return run(args.mode)
+
+    workdir = tempfile.mkdtemp()
+    template = os.path.join(workdir, 'template.sqlite3')
+    print(f'Seeding {args.products} products...')
+    child('--prepare', '--db', template)
+    print(f'{args.threads} clients, {args.write_ratio:.0%} writes, '
+          f'{args.seconds:g}s per mode\n')
+    print(f"{'mode':<9}{'req/s':>8}{'failed':>8}"
+          f"{'read p50':>10}{'p95':>8}{'p99':>8}"
+          f"{'write p50':>11}{'p95':>8}{'p99':>8}   (ms)")
+    throughput = {}
+    for mode in MODES:
+        path = os.path.join(workdir, f'{mode}.sqlite3')
+        shutil.copy(template, path)
+        result = json.loads(child('--mode', mode, '--db', path))
+        read, write = result['read'], result['write']
+        throughput[mode] = (read['requests'] + write['requests']) / args.seconds
+        ms = 1000
+        print(f'{mode:<9}{throughput[mode]:>8.1f}'
+              f"{read['failed'] + write['failed']:>8}"
+              f"{read['p50'] * ms:>10.1f}{read['p95'] * ms:>8.1f}"
+              f"{read['p99'] * ms:>8.1f}"
+              f"{write['p50'] * ms:>11.1f}{write['p95'] * ms:>8.1f}"
+              f"{write['p99'] * ms:>8.1f}")
+    shutil.rmtree(workdir)
+    print(f"\ntuned/default throughput: "
+          f"{throughput['tuned'] / throughput['default']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Process-local request metrics, exposed in the Prometheus text format at
+`/metrics`.
+
+Each worker process keeps its own counters; a scraper sums them across
+processes. Routes are labelled by URL name (`product-list`), never by raw
+path, so the number of series stays bounded.
+"""
+import threading
+
+from django.conf import settings
+
+
+class RouteMetrics:
+    def __init__(self, buckets):
+        self.buckets = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_queries = 0
+        self.db_seconds = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    @property
+    def bucket_bounds(self):
+        """Histogram upper bounds in seconds."""
+        return [ms / 1000 for ms in settings.REQUEST_LATENCY_BUCKETS_MS]
+
+    def observe(self, route, method, seconds, sql_queries, db_seconds):
+        bounds = self.bucket_bounds
+        index = next(
+            (i for i, bound in enumerate(bounds) if seconds <= bound),
+            len(bounds),
+        )
+        with self._lock:
+            metrics = self._routes.get((route, method))
+            if metrics is None:
+                metrics = self._routes[route, method] = RouteMetrics(bounds)
+            metrics.buckets[index] += 1
+            metrics.count += 1
+            metrics.seconds += seconds
+            metrics.sql_queries += sql_queries
+            metrics.db_seconds += db_seconds
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """Return every series in the Prometheus text exposition format."""
+        bounds = [*(f'{bound:g}' for bound in self.bucket_bounds), '+Inf']
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                '# HELP http_request_duration_seconds Request latency by route.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (route, method), metrics in routes:
+                labels = f'route="{route}",method="{method}"'
+                cumulative = 0
+                for bound, observed in zip(bounds, metrics.buckets):
+                    cumulative += observed
+                    lines.append(
+                        f'http_request_duration_seconds_bucket'
+                        f'{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'http_request_duration_seconds_sum{{{labels}}} '
+                    f'{metrics.seconds:.6f}'
+                )
+                lines.append(
+                    f'http_request_duration_seconds_count{{{labels}}} '
+                    f'{metrics.count}'
+                )
+            for name, attr, kind, text, fmt in [
+                ('http_request_sql_queries_total', 'sql_queries', 'counter',
+                 'SQL queries issued by route.', '{}'),
+                ('http_request_db_seconds_total', 'db_seconds', 'counter',
+                 'Time spent in SQL queries by route.', '{:.6f}'),
+            ]:
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (route, method), metrics in routes:
+                    value = fmt.format(getattr(metrics, attr))
+                    lines.append(
+                        f'{name}{{route="{route}",method="{method}"}} {value}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,202 @@
+"""
+Project middleware: request timing and read-replica routing.
+
+`RequestTimingMiddleware` measures SQL, view, serializer and render time
+for every request. Each response gets a `Server-Timing` header, e.g.
+
+    sql;dur=3.1;desc="4 queries", serialize;dur=1.2, view;dur=6.0,
+    render;dur=0.7, total;dur=7.4
+
+`view` covers the view itself, including the SQL and serialization it
+triggers; `render` is the response rendering DRF defers until after the
+view returns. Requests slower than `SLOW_REQUEST_THRESHOLD_MS` are logged
+as one JSON object on the `showcase_api.slow_requests` logger, and every
+request is added to the per-route histograms served at `/metrics`.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import routers
+from .metrics import registry
+from .timing import end_request, install_query_timer, start_request
+
+logger = logging.getLogger('showcase_api.slow_requests')
+
+# Connections opened later (other threads, other aliases) get the timer as
+# they connect; connections already open get it on their first request.
+connection_created.connect(install_query_timer)
+
+
+class RequestTimingMiddleware:
+    # Runs natively in both modes: a sync-only middleware would push every
+    # ASGI request through Django's single sync thread.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark instances as coroutine functions, as MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_query_timer(connection)
+        timing, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        total = time.perf_counter() - timing.start
+
+        phases = timing.phases
+        view_start = getattr(request, '_timing_view_start', None)
+        render_start = getattr(request, '_timing_render_start', None)
+        render_end = getattr(request, '_timing_render_end', None)
+        if view_start is not None:
+            view_end = timing.start + total
+            if render_start is not None:
+                view_end = render_start
+            phases['view'] = view_end - view_start
+        if render_start is not None and render_end is not None:
+            phases['render'] = render_end - render_start
+
+        response['Server-Timing'] = self.server_timing(timing, total)
+        route = self.route(request)
+        registry.observe(
+            route, request.method, total, timing.sql_count, timing.sql_time
+        )
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if threshold is not None and total * 1000 >= threshold:
+            self.log_slow_request(request, response, route, timing, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; bracket that step.
+        request._timing_render_start = time.perf_counter()
+
+        def rendered(response):
+            request._timing_render_end = time.perf_counter()
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def route(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name or match._func_path
+
+    @staticmethod
+    def server_timing(timing, total):
+        ms = 1000
+        entries = [
+            f'sql;dur={timing.sql_time * ms:.2f};'
+            f'desc="{timing.sql_count} queries"'
+        ]
+        for name in ('serialize', 'view', 'render'):
+            if name in timing.phases:
+                entries.append(f'{name};dur={timing.phases[name] * ms:.2f}')
+        entries.append(f'total;dur={total * ms:.2f}')
+        return ', '.join(entries)
+
+    @staticmethod
+    def log_slow_request(request, response, route, timing, total):
+        ms = 1000
+        record = {
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': route,
+            'status': response.status_code,
+            'total_ms': round(total * ms, 2),
+            'sql_queries': timing.sql_count,
+            'sql_ms': round(timing.sql_time * ms, 2),
+            **{
+                f'{name}_ms': round(seconds * ms, 2)
+                for name, seconds in sorted(timing.phases.items())
+            },
+        }
+        logger.warning(json.dumps(record), extra={'timing': record})
+
+
+class ReplicaRoutingMiddleware:
+    """Decide per request whether catalog reads may use a replica (see
+    showcase_api/routers.py), and pin clients that write to the primary
+    for `REPLICA_STICKY_SECONDS` with a cookie."""
+
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'use_primary'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state, token = routers.start_request(self.use_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state, token = routers.start_request(self.use_replicas(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(response, state)
+
+    def use_replicas(self, request):
+        return (
+            request.method in self.safe_methods
+            and self.cookie_name not in request.COOKIES
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # ViewSets expose their class, and extra actions may override it
+        # with `@action(read_from_primary=)`.
+        view_class = getattr(view_func, 'cls', None)
+        initkwargs = getattr(view_func, 'initkwargs', {})
+        if initkwargs.get(
+            'read_from_primary', getattr(view_class, 'read_from_primary', False)
+        ):
+            routers.current_state().use_replicas = False
+
+    def finish(self, response, state):
+        if state.wrote and settings.REPLICA_STICKY_SECONDS:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
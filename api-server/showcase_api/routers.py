@@ -0,0 +1,78 @@
+"""
+Database routing between the primary (`default`) and read replicas.
+
+`ReplicaRouter` sends `Product` and `Category` reads to one of the aliases
+in `DATABASE_REPLICAS`, but only while `ReplicaRoutingMiddleware` has
+opened a `RoutingState` for the current request that allows it: a GET or
+HEAD request, to a view that does not read from the primary (carts and the
+product changes feed do), from a client that has not written recently.
+Everything else (writes, cart traffic, admin, management commands) uses the
+primary.
+
+A request that writes is pinned to the primary for the rest of the request,
+and the middleware pins the client for `REPLICA_STICKY_SECONDS` more with a
+cookie, so a client reads its own writes even while replicas lag.
+
+The state lives in a context variable, so it follows the request into
+`sync_to_async` worker threads.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+REPLICA_MODELS = {('catalog', 'product'), ('catalog', 'category')}
+
+_current = ContextVar('database_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+def current_state():
+    return _current.get()
+
+
+def start_request(use_replicas):
+    """Open routing state for a request; returns `(state, token)` for
+    `end_request`."""
+    state = RoutingState(use_replicas)
+    return state, _current.set(state)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            replicas and state is not None and state.use_replicas
+            and (model._meta.app_label, model._meta.model_name) in REPLICA_MODELS
+        ):
+            return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+            state.use_replicas = False
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        pool = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return db not in settings.DATABASE_REPLICAS
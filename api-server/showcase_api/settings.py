@@ -49,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware.
+    "showcase_api.middleware.RequestTimingMiddleware",
+    "showcase_api.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -84,11 +87,112 @@ WSGI_APPLICATION = "showcase_api.wsgi.application"
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # Django's SQLite backend plus the `pragmas` and `transaction_mode`
+        # options below (see showcase_api/sqlite_backend/base.py).
+        'ENGINE': 'showcase_api.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open across requests instead of reconnecting, and
+        # re-running the pragmas, every time.
+        'CONN_MAX_AGE': 60,
+        # Tests run against a file too: an in-memory database shares one
+        # cache between connections and fails concurrent writers at once
+        # instead of queueing them on busy_timeout like production does.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        'OPTIONS': {
+            # Cart writes read first; take the write lock at BEGIN so they
+            # queue on busy_timeout instead of failing on lock upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                # Readers no longer block on writers, nor writers on readers.
+                'journal_mode': 'wal',
+                # Durable across crashes in WAL mode; only a power loss can
+                # drop the most recent commits.
+                'synchronous': 'normal',
+                # Wait up to 5s for a competing writer instead of failing.
+                'busy_timeout': 5000,
+                # Read pages through a 256 MiB memory map...
+                'mmap_size': 268435456,
+                # ...and cache up to 32 MiB per connection.
+                'cache_size': -32768,
+            },
+        },
     }
 }
 
+# Aliases in DATABASES that product and category reads from GET requests
+# may use, e.g. a copy of db.sqlite3 (see README); writes, carts and
+# everything outside a request use `default`. Clients that wrote stay on
+# `default` for REPLICA_STICKY_SECONDS afterwards.
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 5
+DATABASE_ROUTERS = ['showcase_api.routers.ReplicaRouter']
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Maximum number of serialized product representations kept in the
+# least-recently-used serializer cache (see catalog/cache.py).
+CATALOG_SERIALIZER_CACHE_SIZE = 10000
+CATALOG_SERIALIZER_CACHE = "catalog-serializers"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    CATALOG_SERIALIZER_CACHE: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "catalog-serializers",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": CATALOG_SERIALIZER_CACHE_SIZE},
+    },
+}
+
+# Rows fetched from the database and written to the response per chunk by
+# the streaming product export.
+CATALOG_EXPORT_CHUNK_SIZE = 2000
+
+# Upper bounds of the price buckets counted by /api/products/facets/; the
+# last bucket is open-ended. Facet counts are cached for up to
+# CATALOG_FACETS_CACHE_TIMEOUT seconds per filter signature.
+CATALOG_FACET_PRICE_BUCKETS = (25, 50, 100, 250, 500, 1000)
+CATALOG_FACETS_CACHE_TIMEOUT = 300
+
+# Seconds the precomputed featured feed (catalog/featured.py) is kept before
+# it is rebuilt from the database; reads catch it up with the change log in
+# between.
+CATALOG_FEATURED_FEED_TIMEOUT = 3600
+
+# Most changes returned by one /api/products/changes/ response; clients
+# keep polling while `has_more` is set.
+CATALOG_CHANGES_PAGE_SIZE = 500
+
+# Carts not updated for this many days are deleted by `manage.py purge_carts`.
+CATALOG_CART_TTL_DAYS = 30
+
+# Request timing (showcase_api/middleware.py): requests at least this slow
+# are logged to "showcase_api.slow_requests"; None disables the log.
+SLOW_REQUEST_THRESHOLD_MS = 500
+# Upper bounds of the per-route latency histograms served at /metrics.
+REQUEST_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Client addresses (REMOTE_ADDR) allowed to read /metrics; everyone else gets
+# a 403. Behind a proxy, list the scraper's address as the proxy reports it.
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "showcase_api.slow_requests": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,6 +238,10 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'catalog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
@@ -149,3 +257,6 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Let the dashboards read the validators for conditional GETs.
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified", "Server-Timing"]
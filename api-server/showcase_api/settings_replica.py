@@ -0,0 +1,18 @@
+"""
+Settings with a local read replica: `replica.sqlite3`, a copy of
+`db.sqlite3`, next to it. SQLite does not replicate; refresh the copy with
+
+    sqlite3 db.sqlite3 ".backup replica.sqlite3"
+
+and anything written since shows up as replica lag.
+
+    DJANGO_SETTINGS_MODULE=showcase_api.settings_replica python manage.py runserver
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': BASE_DIR / 'replica.sqlite3',
+}
+DATABASE_REPLICAS = ['replica']
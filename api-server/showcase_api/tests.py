@@ -0,0 +1,231 @@
+import json
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from catalog.models import Cart, Category, Product
+from catalog.views import CartViewSet, ProductViewSet
+
+from . import routers
+from .metrics import registry
+from .middleware import ReplicaRoutingMiddleware
+from .sqlite_backend.base import DatabaseWrapper
+
+
+def timings(response):
+    """Parse Server-Timing into `{name: {param: value}}`."""
+    parsed = {}
+    for entry in response["Server-Timing"].split(","):
+        name, *params = entry.strip().split(";")
+        parsed[name] = dict(param.split("=", 1) for param in params)
+    return parsed
+
+
+class RequestTimingMiddlewareTests(APITestCase):
+    def setUp(self):
+        registry.reset()
+        category = Category.objects.create(name="Cat")
+        self.product = Product.objects.create(
+            title="Prod", description="d", category=category, price=1,
+        )
+
+    def test_server_timing_reports_sql_and_phases(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse("product-list"))
+        entries = timings(resp)
+        self.assertEqual(
+            entries["sql"]["desc"], f'"{len(queries)} queries"'
+        )
+        for name in ("sql", "serialize", "view", "render", "total"):
+            self.assertGreaterEqual(float(entries[name]["dur"]), 0)
+        self.assertLessEqual(
+            float(entries["view"]["dur"]), float(entries["total"]["dur"])
+        )
+
+    def test_slow_requests_are_logged_as_json(self):
+        url = reverse("product-detail", kwargs={"pk": self.product.pk})
+        with self.settings(SLOW_REQUEST_THRESHOLD_MS=0):
+            with self.assertLogs("showcase_api.slow_requests") as logs:
+                self.client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["route"], "product-detail")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["path"], url)
+        self.assertIn("sql_queries", record)
+        self.assertIn("view_ms", record)
+
+    def test_fast_requests_are_not_logged(self):
+        with self.settings(SLOW_REQUEST_THRESHOLD_MS=60_000):
+            with self.assertNoLogs("showcase_api.slow_requests"):
+                self.client.get(reverse("category-list"))
+
+    def test_metrics_exposes_route_histograms(self):
+        self.client.get(reverse("product-list"))
+        self.client.get(reverse("product-list"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        labels = 'route="product-list",method="GET"'
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            body,
+        )
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 2", body)
+        self.assertIn(f"http_request_sql_queries_total{{{labels}}}", body)
+
+    def test_metrics_only_for_allowed_addresses(self):
+        resp = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(resp.status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=()):
+            resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 403)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "tuned.sqlite3")
+
+    def wrapper(self, **options):
+        settings_dict = {**connection.settings_dict, "NAME": self.path}
+        settings_dict["OPTIONS"] = options
+        db = DatabaseWrapper(settings_dict, alias="tuned")
+        self.addCleanup(db.close)
+        return db
+
+    def pragma(self, db, name):
+        with db.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_apply_to_new_connections(self):
+        db = self.wrapper(pragmas={
+            "journal_mode": "wal", "synchronous": "normal",
+            "busy_timeout": 1234, "cache_size": -4096,
+        })
+        self.assertEqual(self.pragma(db, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(db, "synchronous"), 1)
+        self.assertEqual(self.pragma(db, "busy_timeout"), 1234)
+        self.assertEqual(self.pragma(db, "cache_size"), -4096)
+
+    def test_transaction_mode_sets_when_the_write_lock_is_taken(self):
+        other = self.wrapper(pragmas={"busy_timeout": 0})
+        with other.cursor() as cursor:
+            cursor.execute("CREATE TABLE t (x INTEGER)")
+
+        for mode, blocks_writers in ((None, False), ("immediate", True)):
+            with self.subTest(mode=mode):
+                db = self.wrapper(transaction_mode=mode) if mode else self.wrapper()
+                db.ensure_connection()
+                # What atomic() runs to open its transaction.
+                db._start_transaction_under_autocommit()
+                try:
+                    with other.cursor() as cursor:
+                        if blocks_writers:
+                            with self.assertRaisesMessage(
+                                OperationalError, "database is locked"
+                            ):
+                                cursor.execute("INSERT INTO t VALUES (1)")
+                        else:
+                            cursor.execute("INSERT INTO t VALUES (1)")
+                finally:
+                    db.connection.rollback()
+
+    def test_rejects_unsafe_options(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(pragmas={"cache_size; DROP TABLE t": 1}).ensure_connection()
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(transaction_mode="eager").transaction_mode
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_catalog_reads_use_replicas_when_allowed(self):
+        _, token = routers.start_request(use_replicas=True)
+        try:
+            self.assertEqual(router.db_for_read(Product), "replica")
+            self.assertEqual(router.db_for_read(Category), "replica")
+            self.assertEqual(router.db_for_read(Cart), "default")
+        finally:
+            routers.end_request(token)
+
+    def test_primary_outside_requests_and_when_disallowed(self):
+        self.assertEqual(router.db_for_read(Product), "default")
+        _, token = routers.start_request(use_replicas=False)
+        try:
+            self.assertEqual(router.db_for_read(Product), "default")
+        finally:
+            routers.end_request(token)
+
+    def test_writes_pin_the_rest_of_the_request_to_the_primary(self):
+        state, token = routers.start_request(use_replicas=True)
+        try:
+            self.assertEqual(router.db_for_write(Product), "default")
+            self.assertTrue(state.wrote)
+            self.assertEqual(router.db_for_read(Product), "default")
+        finally:
+            routers.end_request(token)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate("replica", "catalog"))
+        self.assertTrue(router.allow_migrate("default", "catalog"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def run_middleware(self, request, view=None, write=False):
+        seen = {}
+
+        def get_response(request):
+            if view is not None:
+                middleware.process_view(request, view, (), {})
+            if write:
+                router.db_for_write(Product)
+            seen["read_db"] = router.db_for_read(Product)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request), seen["read_db"]
+
+    def test_get_reads_from_replica(self):
+        response, read_db = self.run_middleware(self.factory.get("/"))
+        self.assertEqual(read_db, "replica")
+        self.assertNotIn("use_primary", response.cookies)
+
+    def test_writes_set_the_sticky_cookie(self):
+        response, read_db = self.run_middleware(
+            self.factory.post("/"), write=True
+        )
+        self.assertEqual(read_db, "default")
+        self.assertEqual(response.cookies["use_primary"]["max-age"], 5)
+
+    def test_sticky_cookie_keeps_reads_on_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES["use_primary"] = "1"
+        _, read_db = self.run_middleware(request)
+        self.assertEqual(read_db, "default")
+
+    def test_cart_views_read_from_primary(self):
+        _, read_db = self.run_middleware(
+            self.factory.get("/"), view=CartViewSet.as_view({"get": "retrieve"})
+        )
+        self.assertEqual(read_db, "default")
+        _, read_db = self.run_middleware(
+            self.factory.get("/"), view=ProductViewSet.as_view({"get": "list"})
+        )
+        self.assertEqual(read_db, "replica")
+
+    def test_actions_can_read_from_primary(self):
+        # As the router wires it: the action's kwargs become initkwargs.
+        view = ProductViewSet.as_view(
+            {"get": "changes"}, **ProductViewSet.changes.kwargs
+        )
+        _, read_db = self.run_middleware(self.factory.get("/"), view=view)
+        self.assertEqual(read_db, "default")
+
@@ -0,0 +1,90 @@
+"""
+Per-request timing state shared by `RequestTimingMiddleware` and the code
+it measures.
+
+The middleware opens a `RequestTiming` for each request in a context
+variable; `phase()` blocks and the database execute wrapper add to it from
+wherever they run, including `sync_to_async` worker threads (which inherit
+the context). Outside a request every hook is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.phases = {}
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+def current_timing():
+    return _current.get()
+
+
+def start_request():
+    """Begin timing a request; returns `(timing, token)` for `end_request`."""
+    timing = RequestTiming()
+    return timing, _current.set(timing)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to phase `name` of the current
+    request. Nested blocks of the same phase are counted once."""
+    timing = _current.get()
+    if timing is None or name in timing._active:
+        yield
+        return
+    timing._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+        timing._active.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries and their time."""
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.sql_count += 1
+        timing.sql_time += time.perf_counter() - start
+
+
+def install_query_timer(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """Count building a serializer's `.data` as serializer time."""
+
+    @property
+    def data(self):
+        with phase('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
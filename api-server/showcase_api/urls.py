@@ -23,6 +23,7 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("admin/", admin.site.urls),
+    path("metrics", views.metrics, name="metrics"),
     path("api/", include("catalog.urls")),
     # Swagger/OpenAPI endpoints
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -1,6 +1,20 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def index(request):
     """Home page with API documentation links"""
     return render(request, 'index.html')
+
+
+def metrics(request):
+    """Per-route request metrics in the Prometheus text format, for the
+    addresses in `METRICS_ALLOWED_IPS` only."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
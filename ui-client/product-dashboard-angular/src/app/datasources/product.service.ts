@@ -3,6 +3,7 @@ import { Injectable } from '@angular/core';
 import { Observable } from 'rxjs';
 import { map } from 'rxjs/operators';
 import { ApiService, PaginatedResponse } from './api.service';
+import { Category } from './category.service';
 
 export interface Product {
   id: number;
@@ -26,6 +27,15 @@ export interface ProductFilters {
   page_size?: number;
 }
 
+export interface ProductChanges {
+  cursor: number;
+  has_more: boolean;
+  products: Product[];
+  deleted: number[];
+  categories: Category[];
+  deleted_categories: number[];
+}
+
 @Injectable({
   providedIn: 'root'
 })
@@ -52,10 +62,25 @@ export class ProductService {
   }
 
   /**
-   * Get featured products
+   * Get a page of featured products
+   */
+  getFeaturedProducts(page = 1): Observable<Product[]> {
+    return this.apiService.get<PaginatedResponse<Product>>(
+      `${this.endpoint}/featured/`,
+      { page }
+    ).pipe(
+      map(response => response.results)
+    );
+  }
+
+  /**
+   * Get products and categories changed since a cursor (0 for everything)
    */
-  getFeaturedProducts(): Observable<Product[]> {
-    return this.apiService.get<Product[]>(`${this.endpoint}/featured/`);
+  getChanges(since = 0): Observable<ProductChanges> {
+    return this.apiService.get<ProductChanges>(
+      `${this.endpoint}/changes/`,
+      { since }
+    );
   }
 
   /**
@@ -23,6 +23,13 @@ export const getFeaturedProducts = async () => {
   return await get(`${endpoint}/featured/`);
 };
 
+  /**
+   * Get products and categories changed since a cursor (0 for everything)
+   */
+export const getChanges = async (since = 0) => {
+  return await get(`${endpoint}/changes/`, { since });
+};
+
   /**
    * Create a new product
    */